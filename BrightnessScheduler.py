@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional, Tuple
+import pytz
+
+class BrightnessScheduler:
+    # The panel refuses brightness values below this percentage.
+    MIN_HARDWARE_BRIGHTNESS = 5
+
+    def __init__(self, timezone_str: str = "America/Recife", night_start: int = 21, night_end: int = 6,
+                 day_brightness: float = 1.0, night_brightness: float = 0.3, hardware: bool = True):
+        self.timezone = pytz.timezone(timezone_str)
+        self.night_start = night_start
+        self.night_end = night_end
+        self.day_brightness = day_brightness
+        self.night_brightness = night_brightness
+        self.hardware = hardware
+
+    def is_night(self, now: Optional[datetime] = None) -> bool:
+        current_hour = (now or datetime.now(self.timezone)).hour
+        if self.night_start <= self.night_end:
+            return self.night_start <= current_hour < self.night_end
+        return self.night_start <= current_hour or current_hour < self.night_end
+
+    def get_brightness(self, now: Optional[datetime] = None) -> float:
+        return self.night_brightness if self.is_night(now) else self.day_brightness
+
+    def get_levels(self, now: Optional[datetime] = None) -> Tuple[int, float]:
+        """Splits the scheduled brightness into the panel's own brightness percentage and the
+        fade factor that still has to be applied to the rendered pixels."""
+        brightness = max(0.0, min(1.0, self.get_brightness(now)))
+        if not self.hardware:
+            return 100, brightness
+
+        percent = round(brightness * 100)
+        if percent >= self.MIN_HARDWARE_BRIGHTNESS:
+            return percent, 1.0
+        return self.MIN_HARDWARE_BRIGHTNESS, brightness * 100 / self.MIN_HARDWARE_BRIGHTNESS
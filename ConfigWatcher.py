@@ -0,0 +1,42 @@
+import json
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+class ConfigWatcher(threading.Thread):
+    def __init__(self, config_path: str, on_change: Callable[[dict], None], interval: float = 0.5):
+        super().__init__(name='config-watcher', daemon=True)
+        self.config_path = config_path
+        self.on_change = on_change
+        self.interval = interval
+        self.mtime: Optional[int] = self.get_mtime()
+        self.stopped = threading.Event()
+
+    def get_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def run(self):
+        logging.info(f"Watching {self.config_path} for changes.")
+        while not self.stopped.wait(self.interval):
+            mtime = self.get_mtime()
+            if mtime is None or mtime == self.mtime:
+                continue
+            try:
+                with open(self.config_path, 'r') as file:
+                    config = json.load(file)
+            except (OSError, ValueError) as e:
+                # The file may be caught half written, it is read again on the next poll.
+                logging.warning(f"Could not reload configuration yet: {e}")
+                continue
+            self.mtime = mtime
+            try:
+                self.on_change(config)
+            except Exception as e:
+                logging.error(f"Error applying the new configuration: {e}")
+
+    def stop(self):
+        self.stopped.set()
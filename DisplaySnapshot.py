@@ -0,0 +1,69 @@
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Optional
+import numpy as np
+from PIL import Image
+
+class DisplaySnapshot:
+    # Stale snapshots are shown dimmed, so an old graph is not mistaken for live data.
+    STALE_FADE = 0.3
+
+    def __init__(self, snapshot_dir: str = os.path.join('temp', 'snapshot')):
+        self.snapshot_dir = snapshot_dir
+        self.state_path = os.path.join(snapshot_dir, 'state.json')
+        self.frame_path = os.path.join(snapshot_dir, 'frame.png')
+        self.stale_frame_path = os.path.join(snapshot_dir, 'frame-stale.png')
+        self.payload_path = os.path.join(snapshot_dir, 'payload.gif')
+        self.state: dict = {}
+
+    def save(self, state: dict, frame: Optional[np.ndarray] = None, payload_path: Optional[str] = None):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        try:
+            if frame is not None:
+                Image.fromarray(frame).save(self.frame_path + '.tmp', format='PNG')
+                os.replace(self.frame_path + '.tmp', self.frame_path)
+            if payload_path and payload_path.endswith('.gif') and os.path.exists(payload_path):
+                shutil.copyfile(payload_path, self.payload_path + '.tmp')
+                os.replace(self.payload_path + '.tmp', self.payload_path)
+            self.state = dict(state, saved_at=time.time())
+            # The state is replaced last, it must never point to files of an older snapshot.
+            with open(self.state_path + '.tmp', 'w') as file:
+                json.dump(self.state, file)
+            os.replace(self.state_path + '.tmp', self.state_path)
+        except OSError as e:
+            logging.error(f"Could not save the display snapshot: {e}")
+
+    def load(self) -> Optional[dict]:
+        try:
+            with open(self.state_path, 'r') as file:
+                self.state = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read the display snapshot: {e}")
+            return None
+        return self.state
+
+    def get_age(self) -> float:
+        return time.time() - self.state.get('saved_at', 0)
+
+    def get_frame(self, stale: bool = False) -> Optional[np.ndarray]:
+        try:
+            with Image.open(self.frame_path) as img:
+                frame = np.array(img.convert('RGB'))
+        except OSError:
+            return None
+        if stale:
+            frame = (frame * self.STALE_FADE).astype(np.uint8)
+            Image.fromarray(frame).save(self.stale_frame_path, format='PNG')
+        return frame
+
+    def get_payload_path(self, stale: bool = False) -> Optional[str]:
+        if stale:
+            return self.stale_frame_path if os.path.exists(self.stale_frame_path) else None
+        if self.state.get('output_type') != 'image' and os.path.exists(self.payload_path):
+            return self.payload_path
+        return self.frame_path if os.path.exists(self.frame_path) else None
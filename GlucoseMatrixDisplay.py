@@ -1,39 +1,44 @@
 import math
 import os
 import subprocess
-import cv2
-import numpy as np
 import requests
 import time
 import json
 import datetime
 import logging
+import threading
 from typing import List
 from http.client import RemoteDisconnected
 from util import GlucoseItem, TreatmentItem, ExerciseItem, TreatmentEnum, EntrieEnum
 from PixelMatrix import PixelMatrix
+from StatusScreenCache import StatusScreenCache
+from BrightnessScheduler import BrightnessScheduler
+from OutputBackends import MirrorBackend, create_backend
+from GlucoseStore import GlucoseStore
+from DisplaySnapshot import DisplaySnapshot
+from IobSeries import IobSeries, BUCKET_SECONDS, DEFAULT_DURATION, DEFAULT_PEAK, calculate_iob, check_insulin_curve
+from ConfigWatcher import ConfigWatcher
 
 logging.basicConfig(filename='app.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+class ConfigPending(Exception):
+    """raised to leave a fetch retry loop when a new configuration is waiting to be applied"""
+
 class GlucoseMatrixDisplay:
     def __init__(self, config_path=os.path.join('led_matrix_configurator', 'config.json'), matrix_size=32, min_glucose=60, max_glucose=180):
         self.matrix_size = matrix_size
         self.min_glucose = min_glucose
         self.max_glucose = max_glucose
         self.max_time = 1200000 #milliseconds
-        self.config = self.load_config(config_path)
-        self.ip = self.config.get('ip')
-        token = self.config.get('token')
-        self.url_entries = f"{self.config.get('url')}/entries.json?token={token}&count=40"
-        self.url_treatments = f"{self.config.get('url')}/treatments.json?token={token}&count=10"
-        self.url_ping_entries = f"{self.config.get('url')}/entries.json?token={token}&count=1"
-        self.url_iob = f"{self.config.get('url')}/properties/iob?token={token}"
-        self.GLUCOSE_LOW = self.config.get('low bondary glucose')
-        self.GLUCOSE_HIGHT = self.config.get('high bondary glucose')
-        self.os = self.config.get('os', 'linux').lower()
-        self.image_out = self.config.get('image out', 'led matrix')
-        self.output_type = self.config.get("output type")
-        self.night_brightness = float(self.config.get('night_brightness', 0.3))
+        self.entries_count = 40
+        self.treatments_count = 10
+        self.config_path = config_path
+        self.apply_config(self.load_config(config_path))
+        self.hardware_brightness, self.software_brightness = self.brightness_scheduler.get_levels()
+        self.session = requests.Session()
+        # Set by the config watcher, wakes the loop up instead of letting it sleep.
+        self.wake_up = threading.Event()
+        self.pending_config = None
         self.arrow = ''
         self.glucose_difference = 0
         self.first_value = None
@@ -43,8 +48,79 @@ class GlucoseMatrixDisplay:
         self.iob_list: List[float] = []
         self.newer_id = None
         self.command = ''
+        self.output_path = None
+        self.frame = None
+        self.output = create_backend(self.image_out, self.preview_url)
+        self.current_status = None
+        self.status_screens = StatusScreenCache()
+        self.status_screens.preload()
+        self.store = GlucoseStore(retention_days=self.history_days)
+        self.store.set_source(self.config.get('url'))
+        self.store.prune()
+        self.snapshot = DisplaySnapshot()
+        self.iob_series = IobSeries(self.matrix_size + 1)
+        self.iob_series.extend(self.store.get_iob_samples(time.time() - self.matrix_size * BUCKET_SECONDS))
         if self.image_out == "led matrix": self.unblock_bluetooth()
 
+    def apply_config(self, config):
+        self.config = config
+        self.ip = self.config.get('ip')
+        token = self.config.get('token')
+        self.url_entries = f"{self.config.get('url')}/entries.json?token={token}&count={self.entries_count}"
+        self.url_treatments = f"{self.config.get('url')}/treatments.json?token={token}&count={self.treatments_count}"
+        self.url_ping_entries = f"{self.config.get('url')}/entries.json?token={token}&count=1"
+        self.url_iob = f"{self.config.get('url')}/properties/iob?token={token}"
+        self.GLUCOSE_LOW = self.config.get('low bondary glucose')
+        self.GLUCOSE_HIGHT = self.config.get('high bondary glucose')
+        self.os = self.config.get('os', 'linux').lower()
+        self.image_out = self.config.get('image out', 'led matrix')
+        # Empty to stop sending frames to the configurator preview.
+        self.preview_url = self.config.get('preview url', MirrorBackend.DEFAULT_URL)
+        self.output_type = self.config.get("output type")
+        self.night_brightness = float(self.config.get('night_brightness', 0.3))
+        self.brightness_scheduler = BrightnessScheduler(self.config.get('timezone', 'America/Recife'),
+                                                        int(self.config.get('night_start', 21)),
+                                                        int(self.config.get('night_end', 6)),
+                                                        float(self.config.get('day_brightness', 1.0)),
+                                                        self.night_brightness,
+                                                        hardware=self.image_out == "led matrix")
+        # 'nightscout' polls properties/iob every update, 'local' computes it from the stored boluses.
+        self.iob_source = self.config.get('iob source', 'nightscout').lower()
+        # Checked here, a peak of half the duration or more would break the curve inside the loop.
+        self.insulin_duration, self.insulin_peak = check_insulin_curve(float(self.config.get('insulin duration', DEFAULT_DURATION)),
+                                                                       float(self.config.get('insulin peak', DEFAULT_PEAK)))
+        self.history_days = int(self.config.get('history days', 90))
+
+    def queue_config(self, config):
+        # Called from the watcher thread, the loop applies the config between two cycles.
+        self.pending_config = config
+        self.wake_up.set()
+
+    def reload_config(self):
+        config, self.pending_config = self.pending_config, None
+        changed = {key for key in set(self.config) | set(config) if self.config.get(key) != config.get(key)}
+        if not changed:
+            return
+        logging.info(f"Configuration changed: {', '.join(sorted(changed))}")
+        self.apply_config(config)
+        self.store.retention_days = self.history_days
+        if changed & {'url', 'token'}:
+            # Only the HTTP layer is reset, the output and its bluetooth link stay as they are.
+            self.session.close()
+            self.session = requests.Session()
+        if 'url' in changed:
+            # Entries of the old site must not mix into the history of the new one.
+            self.store.set_source(self.config.get('url'))
+            self.iob_series = IobSeries(self.matrix_size + 1)
+        if changed & {'image out', 'preview url'}:
+            self.output.close()
+            self.output = create_backend(self.image_out, self.preview_url)
+        if 'image out' in changed and self.image_out == "led matrix":
+            self.unblock_bluetooth()
+        # The brightness schedule is picked up by apply_brightness_schedule, everything else needs a redraw.
+        if changed - {'timezone', 'night_start', 'night_end', 'day_brightness', 'night_brightness'}:
+            self.newer_id = None
+
     def load_config(self, config_path):
         try:
             logging.info(f"Loading configuration from {config_path}")
@@ -56,106 +132,177 @@ class GlucoseMatrixDisplay:
             logging.error(f"Error loading configuration file: {e}")
             raise Exception(f"Error loading configuration file: {e}")
 
-    def update_glucose_command(self, image_path=None):
+    def update_glucose_command(self):
         logging.info("Updating glucose command.")
-        self.json_entries_data = self.fetch_json_data(self.url_entries)
-        self.json_treatments_data = self.fetch_json_data(self.url_treatments)
-        self.json_iob = self.fetch_json_data(self.url_iob)
+        self.json_entries_data = self.fetch_entries()
+        self.json_treatments_data = self.fetch_treatments()
+        self.json_iob = self.fetch_json_data(self.url_iob) if self.iob_source != 'local' else None
 
         if self.json_entries_data:
             self.parse_matrix_values()
             self.pixelMatrix = self.build_pixel_matrix()
 
-            if image_path:
-                output_path = image_path
-                type_comand = "--image true --set-image"
-            elif self.output_type == "image":
-                output_path = os.path.join("temp", "output_image.png")
-                self.pixelMatrix.generate_image(output_path)
+            # Only the panel needs the frame as a file, the other backends take it from memory.
+            if self.output_type == "image":
+                self.output_path = os.path.join("temp", "output_image.png")
+                if self.output.needs_file:
+                    self.pixelMatrix.generate_image(self.output_path)
                 type_comand = "--image true --set-image"
             else:
-                self.pixelMatrix.generate_timer_gif()
-                output_path = os.path.join("temp", "output_gif.gif")
+                if self.output.needs_file:
+                    self.pixelMatrix.generate_timer_gif()
+                self.output_path = os.path.join("temp", "output_gif.gif")
                 type_comand = "--set-gif"
+            self.frame = self.pixelMatrix.get_frame()
             self.reset_formmated_jsons()
-
-            if self.os == 'windows':
-                self.command = f"run_in_venv.bat --address {self.ip} {type_comand} {output_path}"
-            else:
-                self.command = f"./run_in_venv.sh --address {self.ip} {type_comand} {output_path}"
+            self.build_command(f"{type_comand} {self.output_path}")
+            self.current_status = None
         logging.info(f"Command updated: {self.command}")
 
-    def run_command(self):
-        logging.info(f"Running command: {self.command}")
-        if self.image_out != "led matrix":
-            img = cv2.imread(os.path.join("temp", "output_image.png"))
-            bright_img = cv2.add(img, np.ones(img.shape, dtype="uint8") * 50)
-
-            # Concatenate images horizontally
-            side_by_side = np.hstack((img, bright_img))
+    def build_command(self, arguments=''):
+        # The panel keeps its brightness, so this only costs a BLE write when the schedule changed it.
+        arguments = f"--set-brightness {self.hardware_brightness} {arguments}".strip()
+        if self.os == 'windows':
+            self.command = f"run_in_venv.bat --address {self.ip} {arguments}"
+        else:
+            self.command = f"./run_in_venv.sh --address {self.ip} {arguments}"
+
+    def apply_brightness_schedule(self):
+        hardware_brightness, software_brightness = self.brightness_scheduler.get_levels()
+        if software_brightness != self.software_brightness:
+            logging.info(f"Frame fading changed to {software_brightness:.2f}, redrawing on the next update.")
+            self.hardware_brightness, self.software_brightness = hardware_brightness, software_brightness
+            self.newer_id = None
+        elif hardware_brightness != self.hardware_brightness:
+            logging.info(f"Switching panel brightness to {hardware_brightness}%.")
+            self.hardware_brightness = hardware_brightness
+            self.build_command()
+            self.run_command()
+
+    def show_status_screen(self, name):
+        if self.current_status == name:
+            return
+        output_path = self.status_screens.get_path(name, self.matrix_size)
+        if output_path is None:
+            logging.error(f"Status screen '{name}' is not available for size {self.matrix_size}.")
+            return
+        logging.info(f"Showing status screen '{name}'.")
+        self.output_path = output_path
+        self.frame = self.status_screens.get_frame(name, self.matrix_size)
+        self.build_command(f"--image true --set-image {output_path}")
+        self.run_command(self.frame)
+        self.current_status = name
+        self.save_snapshot()
+        # Force a full redraw once fresh data shows up again, even if its id did not change.
+        self.newer_id = None
 
-            # Display the concatenated image in fullscreen
-            cv2.namedWindow('Led Matrix', cv2.WND_PROP_FULLSCREEN)
-            cv2.setWindowProperty('Led Matrix', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-            cv2.imshow('Led Matrix', side_by_side)
+    def run_command(self, frame=None):
+        logging.info(f"Running command: {self.command}")
+        self.output.show(frame, self.command, f"last glucose: {self.first_value}")
+
+    def save_snapshot(self):
+        state = {'newer_id': self.newer_id,
+                 'output_type': self.output_type,
+                 'first_value': self.first_value,
+                 'hardware_brightness': self.hardware_brightness,
+                 'software_brightness': self.software_brightness,
+                 'status': self.current_status}
+        # A status screen keeps the last glucose frame on disk, only the state remembers the screen.
+        if self.current_status is None:
+            self.snapshot.save(state, self.frame, self.output_path)
+        else:
+            self.snapshot.save(state)
 
-            # Wait until a key is pressed
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
+    def restore_snapshot(self):
+        state = self.snapshot.load()
+        if state is None:
             return
-        
-        for _ in range(1,5):
-            try:
-                result = subprocess.run(self.command, shell=True, check=True)
-                if result.returncode != 0:
-                    logging.error("Command failed.")
-                else:
-                    logging.info(f"Command executed successfully, with last glucose: {self.first_value}")
-                    break
-            except subprocess.CalledProcessError as e:
-                logging.error(f"Command failed with error: {e}")
-                time.sleep(2)
+        if state.get('status'):
+            logging.info(f"Restoring status screen '{state['status']}' of the last run.")
+            self.show_status_screen(state['status'])
+            return
+        stale = self.snapshot.get_age() * 1000 > self.max_time
+        frame = self.snapshot.get_frame(stale)
+        payload_path = self.snapshot.get_payload_path(stale)
+        if frame is None or payload_path is None:
+            return
+        logging.info(f"Showing the {'stale ' if stale else ''}frame of the last run, saved {self.snapshot.get_age():.0f} seconds ago.")
+        self.first_value = state.get('first_value')
+        self.frame = frame
+        type_comand = "--set-gif" if payload_path.endswith('.gif') else "--image true --set-image"
+        self.output_path = payload_path
+        self.build_command(f"{type_comand} {payload_path}")
+        self.run_command(frame)
+        # The loop only redraws if the data changed since the snapshot, a stale or dimmed frame is always replaced.
+        if not stale and state.get('software_brightness') == self.software_brightness:
+            self.newer_id = state.get('newer_id')
 
     def run_command_in_loop(self):
         logging.info("Starting command loop.")
+        self.restore_snapshot()
+        ConfigWatcher(self.config_path, self.queue_config).start()
         while True:
             try:
+                if self.pending_config is not None:
+                    self.reload_config()
+                self.apply_brightness_schedule()
                 ping_json = self.fetch_json_data(self.url_ping_entries)[0]
                 if not ping_json or self.is_old_data(ping_json):
-                    if "nocgmdata.png" in self.command:
-                        continue
-                    logging.info("Old or missing data detected, updating to no data image.")
-                    self.update_glucose_command(os.path.join('images', 'nocgmdata.png'))
-                    self.run_command()
+                    if self.current_status != 'nocgmdata':
+                        logging.info("Old or missing data detected, updating to no data image.")
+                        self.show_status_screen('nocgmdata')
                 elif ping_json.get("_id") != self.newer_id:
                     logging.info("New glucose data detected, updating display.")
-                    self.json_entries_data = self.fetch_json_data(self.url_entries)
                     self.update_glucose_command()
-                    self.run_command()
+                    self.run_command(self.frame)
                     self.newer_id = ping_json.get("_id")
-                time.sleep(5)
+                    self.save_snapshot()
+                self.wait(5)
+            except ConfigPending:
+                # The new configuration is applied at the top of the loop, with the urls built from it.
+                continue
             except Exception as e:
                 logging.error(f"Error in the loop: {e}")
-                time.sleep(60)
+                self.wait(60)
+
+    def wait(self, seconds):
+        # The backend waits, so a preview window keeps handling its events meanwhile.
+        self.output.wait(self.wake_up, seconds)
+        self.wake_up.clear()
 
     def reset_formmated_jsons(self):
         self.formmated_entries = []
         self.formmated_treatments = []
 
+    def fetch_entries(self):
+        # Only entries newer than the stored ones are fetched, the render window is read back from the store.
+        latest_date = self.store.latest_entry_date()
+        url = self.url_entries if latest_date is None else f"{self.url_entries}&find[date][$gt]={latest_date}"
+        new_entries = self.store.add_entries(self.fetch_json_data(url))
+        logging.info(f"Stored {new_entries} new glucose entries.")
+        return self.store.get_entries(self.entries_count)
+
+    def fetch_treatments(self):
+        # $gte refetches the newest stored treatment too, so an edit to it is picked up.
+        latest_created_at = self.store.latest_treatment_created_at()
+        url = self.url_treatments if latest_created_at is None else f"{self.url_treatments}&find[created_at][$gte]={latest_created_at}"
+        new_treatments = self.store.add_treatments(self.fetch_json_data(url))
+        logging.info(f"Stored {new_treatments} new treatments.")
+        return self.store.get_treatments(self.treatments_count)
+
     def fetch_json_data(self, url, retries=5, delay=10, fallback_delay=300):
         attempt = 0
         while True:
             try:
                 logging.info(f"Fetching glucose data from {url}")
-                response = requests.get(url, timeout=10)
+                response = self.session.get(url, timeout=10)
                 response.raise_for_status()
                 logging.info("Glucose data fetched successfully.")
                 return response.json()
 
             except RemoteDisconnected as e:
                 logging.error(f"Remote end closed connection on attempt {attempt + 1}: {e}")
-                self.update_glucose_command("./images/no_wifi.png")
-                self.run_command()
+                self.show_status_screen('no_wifi')
 
             except requests.exceptions.ConnectionError as e:
                 logging.error(f"Connection error on attempt {attempt + 1}: {e}")
@@ -166,15 +313,18 @@ class GlucoseMatrixDisplay:
             except requests.exceptions.RequestException as e:
                 logging.error(f"Error fetching data on attempt {attempt + 1}: {e}")
 
-            # Handle retries and delays
+            # Handle retries and delays, a new configuration ends the wait and the retries
             attempt += 1
             if attempt < retries:
                 logging.info(f"Retrying in {delay} seconds... (Attempt {attempt} of {retries})")
-                time.sleep(delay)
+                self.wait(delay)
             else:
                 logging.error(f"Max retries ({retries}) reached. Retrying in {fallback_delay} seconds.")
                 attempt = 0  # Reset attempts after max retries
-                time.sleep(fallback_delay)  # Wait longer before retrying again
+                self.wait(fallback_delay)  # Wait longer before retrying again
+            if self.pending_config is not None:
+                # The url was built from the old configuration, the loop fetches again with the new one.
+                raise ConfigPending()
 
     def set_arrow(self):
         for item in self.formmated_entries:
@@ -195,7 +345,7 @@ class GlucoseMatrixDisplay:
         
         exercise_indexes = self.get_exercises_index()
 
-        pixelMatrix = PixelMatrix(self.matrix_size,self.min_glucose,self.max_glucose, self.GLUCOSE_LOW, self.GLUCOSE_HIGHT, self.night_brightness)
+        pixelMatrix = PixelMatrix(self.matrix_size,self.min_glucose,self.max_glucose, self.GLUCOSE_LOW, self.GLUCOSE_HIGHT, self.software_brightness)
         pixelMatrix.set_formmated_entries(self.formmated_entries)
         pixelMatrix.set_formmated_treatments(self.formmated_treatments)
         pixelMatrix.set_arrow(self.arrow)
@@ -376,12 +526,15 @@ class GlucoseMatrixDisplay:
         return bolus_with_x_values, carbs_with_x_values, exercises_with_x_values
 
     def get_iob(self):
+        now = time.time()
+        if self.iob_source == 'local':
+            boluses = self.store.get_boluses(now - self.matrix_size * BUCKET_SECONDS - self.insulin_duration * 60)
+            return [calculate_iob(boluses, now - column * BUCKET_SECONDS, self.insulin_duration, self.insulin_peak)
+                    for column in range(self.matrix_size)]
         iob_value = self.json_iob.get("iob", {}).get("iob", None)
-        if iob_value == None:
-            self.iob_list.insert(0,0)
-        else:
-            self.iob_list.insert(0,iob_value)
-        return self.iob_list[:self.matrix_size]
+        self.store.add_iob(iob_value, now)
+        self.iob_series.add(iob_value, now)
+        return self.iob_series.get_columns(self.matrix_size)
 
 
 if __name__ == "__main__":
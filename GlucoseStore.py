@@ -0,0 +1,117 @@
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+class GlucoseStore:
+    def __init__(self, path: str = os.path.join('temp', 'glucose.db'), retention_days: int = 90):
+        self.path = path
+        self.retention_days = retention_days
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (id TEXT PRIMARY KEY, date INTEGER NOT NULL, data TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+            CREATE TABLE IF NOT EXISTS treatments (id TEXT PRIMARY KEY, date INTEGER NOT NULL, created_at TEXT NOT NULL, data TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS treatments_date ON treatments (date);
+            CREATE TABLE IF NOT EXISTS iob (date INTEGER PRIMARY KEY, value REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        self.connection.commit()
+        logging.info(f"Glucose history opened at {path} with {self.count('entries')} entries and {self.count('treatments')} treatments.")
+
+    def count(self, table: str) -> int:
+        return self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def add_entries(self, entries: List[dict]) -> int:
+        rows = [(item.get('_id') or f"{item.get('date')}-{item.get('type')}", int(item['date']), json.dumps(item))
+                for item in entries if item.get('date') is not None]
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO entries (id, date, data) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def add_treatments(self, treatments: List[dict]) -> int:
+        rows = []
+        for item in treatments:
+            date = self.parse_date(item.get('created_at'))
+            if date is None:
+                continue
+            rows.append((item.get('_id') or f"{date}-{item.get('eventType')}", date, item['created_at'], json.dumps(item)))
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO treatments (id, date, created_at, data) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def add_iob(self, value: Optional[float], date: Optional[float] = None):
+        date_ms = int((time.time() if date is None else date) * 1000)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO iob (date, value) VALUES (?, ?)", (date_ms, value or 0))
+
+    def get_entries(self, count: int) -> List[dict]:
+        # Newest first, the same order the Nightscout API returns.
+        rows = self.connection.execute("SELECT data FROM entries ORDER BY date DESC LIMIT ?", (count,))
+        return [json.loads(data) for data, in rows]
+
+    def get_treatments(self, count: int) -> List[dict]:
+        rows = self.connection.execute("SELECT data FROM treatments ORDER BY date DESC LIMIT ?", (count,))
+        return [json.loads(data) for data, in rows]
+
+    def get_iob_samples(self, since: float) -> List[Tuple[float, float]]:
+        """(timestamp, iob) samples, oldest first"""
+        rows = self.connection.execute("SELECT date, value FROM iob WHERE date >= ? ORDER BY date", (int(since * 1000),))
+        return [(date / 1000, value) for date, value in rows]
+
+    def get_boluses(self, since: float) -> List[Tuple[float, float]]:
+        """(timestamp, units) of every treatment with insulin, oldest first"""
+        rows = self.connection.execute("SELECT date, data FROM treatments WHERE date >= ? ORDER BY date", (int(since * 1000),))
+        boluses = []
+        for date, data in rows:
+            insulin = json.loads(data).get('insulin')
+            if insulin:
+                boluses.append((date / 1000, float(insulin)))
+        return boluses
+
+    def latest_entry_date(self) -> Optional[int]:
+        return self.connection.execute("SELECT MAX(date) FROM entries").fetchone()[0]
+
+    def latest_treatment_created_at(self) -> Optional[str]:
+        row = self.connection.execute("SELECT created_at FROM treatments ORDER BY date DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def set_source(self, url: Optional[str]):
+        """drops the history when it was fetched from another Nightscout site"""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        source = url or ''
+        if row is not None and row[0] == source:
+            return
+        with self.connection:
+            if row is not None:
+                logging.info(f"Nightscout site changed, dropping the history of {row[0]}.")
+                for table in ('entries', 'treatments', 'iob'):
+                    self.connection.execute(f"DELETE FROM {table}")
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (source,))
+
+    def prune(self):
+        cutoff = int((time.time() - self.retention_days * 86400) * 1000)
+        with self.connection:
+            for table in ('entries', 'treatments', 'iob'):
+                self.connection.execute(f"DELETE FROM {table} WHERE date < ?", (cutoff,))
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def parse_date(created_at: Optional[str]) -> Optional[int]:
+        if not created_at:
+            return None
+        try:
+            date = datetime.datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        except ValueError:
+            logging.warning(f"Skipping treatment with unreadable date {created_at}.")
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        return int(date.timestamp() * 1000)
@@ -0,0 +1,90 @@
+import logging
+import math
+import time
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+# Same column width as PixelMatrix.display_entries.
+BUCKET_SECONDS = 5 * 60
+
+class IobSeries:
+    def __init__(self, capacity: int, bucket_seconds: int = BUCKET_SECONDS):
+        self.capacity = capacity
+        self.bucket_seconds = bucket_seconds
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float32)
+        self.head = 0
+        self.size = 0
+
+    def add(self, value: Optional[float], timestamp: Optional[float] = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        value = value or 0
+        last = (self.head - 1) % self.capacity
+        if self.size and self.bucket(timestamp) == self.bucket(self.times[last]):
+            # A repeated poll within the same bucket replaces the older sample instead of taking a slot.
+            self.times[last] = timestamp
+            self.values[last] = value
+            return
+        self.times[self.head] = timestamp
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def extend(self, samples: Iterable[Tuple[float, float]]):
+        for timestamp, value in samples:
+            self.add(value, timestamp)
+
+    def get_columns(self, count: int, newest: Optional[float] = None) -> List[float]:
+        """column 0 is the newest, like the glucose entries.
+        Columns are counted back from the newest sample unless another time is given.
+        """
+        columns = np.zeros(count, dtype=np.float32)
+        if not self.size:
+            return columns.tolist()
+        # Newest first, so np.unique below keeps the newest sample of every column.
+        order = np.argsort(self.times[:self.size])[::-1]
+        times = self.times[:self.size][order]
+        newest = times[0] if newest is None else newest
+        indexes = ((newest - times) // self.bucket_seconds).astype(int)
+        valid = np.flatnonzero((indexes >= 0) & (indexes < count))
+        unique_indexes, first = np.unique(indexes[valid], return_index=True)
+        columns[unique_indexes] = self.values[:self.size][order][valid[first]]
+        return columns.tolist()
+
+
+# Defaults of the exponential curve: rapid acting insulin, 5 hours with the peak after 75 minutes.
+DEFAULT_DURATION = 300
+DEFAULT_PEAK = 75
+MIN_DURATION = 60
+
+def check_insulin_curve(duration: float, peak: float) -> Tuple[float, float]:
+    """returns a duration and peak the curve can be computed with, the model needs 0 < peak < duration / 2"""
+    if duration < MIN_DURATION:
+        logging.warning(f"Insulin duration {duration} is shorter than {MIN_DURATION} minutes, using {DEFAULT_DURATION}.")
+        duration = DEFAULT_DURATION
+    if not 0 < peak < duration / 2:
+        clamped = min(max(peak, 1), duration / 2 - 1)
+        logging.warning(f"Insulin peak {peak} has to be between 0 and half the duration of {duration} minutes, using {clamped}.")
+        peak = clamped
+    return duration, peak
+
+
+def insulin_activity_curve(minutes: float, duration: float, peak: float) -> float:
+    """fraction of a bolus still on board, exponential model as used by OpenAPS"""
+    if minutes <= 0:
+        return 1.0
+    if minutes >= duration:
+        return 0.0
+    tau = peak * (1 - peak / duration) / (1 - 2 * peak / duration)
+    a = 2 * tau / duration
+    s = 1 / (1 - a + (1 + a) * math.exp(-duration / tau))
+    return 1 - s * (1 - a) * ((minutes ** 2 / (tau * duration * (1 - a)) - minutes / tau - 1) * math.exp(-minutes / tau) + 1)
+
+
+def calculate_iob(boluses: List[Tuple[float, float]], at: float, duration: float = 300, peak: float = 75) -> float:
+    """insulin on board at the given time from (timestamp, units) boluses"""
+    return sum(units * insulin_activity_curve((at - timestamp) / 60, duration, peak)
+               for timestamp, units in boluses if timestamp <= at)
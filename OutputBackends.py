@@ -0,0 +1,213 @@
+import collections
+import io
+import logging
+import queue
+import subprocess
+import sys
+import threading
+import time
+from typing import Deque, Optional, Tuple
+import numpy as np
+
+class OutputBackend:
+    # Backends which upload files need the frame written to disk first.
+    needs_file = False
+
+    def show(self, frame: Optional[np.ndarray], command: str, label: str = ''):
+        """frame is an RGB uint8 array (None for setting-only commands), command the app.py call for the panel"""
+        raise NotImplementedError
+
+    def wait(self, wake_up: threading.Event, seconds: float) -> bool:
+        """waits between two updates, returns early when wake_up is set"""
+        return wake_up.wait(seconds)
+
+    def close(self):
+        pass
+
+
+class LedMatrixBackend(OutputBackend):
+    needs_file = True
+
+    def __init__(self, retries: int = 4, retry_delay: float = 2):
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def show(self, frame, command, label=''):
+        for _ in range(self.retries):
+            try:
+                result = subprocess.run(command, shell=True, check=True)
+                if result.returncode != 0:
+                    logging.error("Command failed.")
+                else:
+                    logging.info(f"Command executed successfully{f', with {label}' if label else ''}.")
+                    return True
+            except subprocess.CalledProcessError as e:
+                logging.error(f"Command failed with error: {e}")
+                time.sleep(self.retry_delay)
+        return False
+
+
+class PreviewBackend(OutputBackend):
+    WINDOW = 'Led Matrix'
+    # milliseconds between two event polls of the window while the loop waits
+    EVENT_INTERVAL = 50
+
+    def __init__(self, fullscreen: bool = True, highlight: int = 50):
+        import cv2
+        self.cv2 = cv2
+        self.fullscreen = fullscreen
+        self.highlight = highlight
+        self.window_open = False
+
+    def show(self, frame, command, label=''):
+        if frame is None:
+            return True
+        cv2 = self.cv2
+        img = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        bright_img = cv2.add(img, np.full(img.shape, self.highlight, dtype=np.uint8))
+        # The original next to a brightened copy, so dim pixels stay visible on a monitor.
+        side_by_side = np.hstack((img, bright_img))
+        if not self.window_open:
+            cv2.namedWindow(self.WINDOW, cv2.WND_PROP_FULLSCREEN if self.fullscreen else cv2.WINDOW_NORMAL)
+            if self.fullscreen:
+                cv2.setWindowProperty(self.WINDOW, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+            self.window_open = True
+        cv2.imshow(self.WINDOW, side_by_side)
+        # Only lets the window repaint, the display loop keeps running.
+        cv2.waitKey(1)
+        return True
+
+    def wait(self, wake_up, seconds):
+        if not self.window_open:
+            return wake_up.wait(seconds)
+        # The window only handles its events inside waitKey, so they are pumped while the loop waits.
+        deadline = time.monotonic() + seconds
+        while not wake_up.is_set() and time.monotonic() < deadline:
+            self.cv2.waitKey(self.EVENT_INTERVAL)
+        return wake_up.is_set()
+
+    def close(self):
+        if self.window_open:
+            self.cv2.destroyAllWindows()
+            self.window_open = False
+
+
+class TerminalBackend(OutputBackend):
+    UPPER_HALF_BLOCK = '▀'
+
+    def __init__(self, stream=None, in_place: bool = True):
+        self.stream = stream or sys.stdout
+        self.in_place = in_place
+        self.rows_drawn = 0
+
+    def render(self, frame: np.ndarray) -> str:
+        # Every character shows two pixel rows: the upper one as foreground, the lower one as background.
+        if frame.shape[0] % 2:
+            frame = np.vstack((frame, np.zeros((1,) + frame.shape[1:], dtype=frame.dtype)))
+        lines = []
+        for upper, lower in zip(frame[0::2], frame[1::2]):
+            cells = [f"\x1b[38;2;{a[0]};{a[1]};{a[2]}m\x1b[48;2;{b[0]};{b[1]};{b[2]}m{self.UPPER_HALF_BLOCK}"
+                     for a, b in zip(upper.tolist(), lower.tolist())]
+            lines.append(''.join(cells) + '\x1b[0m')
+        return '\n'.join(lines)
+
+    def show(self, frame, command, label=''):
+        if frame is None:
+            return True
+        output = self.render(frame)
+        if self.in_place and self.rows_drawn:
+            # Move the cursor back up so the next frame overwrites the previous one.
+            self.stream.write(f"\x1b[{self.rows_drawn}F")
+        self.stream.write(output + '\n')
+        if label:
+            self.stream.write(f"\x1b[2K{label}\n")
+        self.stream.flush()
+        self.rows_drawn = output.count('\n') + 1 + (1 if label else 0)
+        return True
+
+
+class NullBackend(OutputBackend):
+    def __init__(self, keep: int = 100):
+        self.frames: Deque[Tuple[float, np.ndarray]] = collections.deque(maxlen=keep)
+        self.commands: Deque[str] = collections.deque(maxlen=keep)
+        self.frame_count = 0
+
+    def show(self, frame, command, label=''):
+        self.commands.append(command)
+        if frame is not None:
+            self.frames.append((time.time(), frame.copy()))
+            self.frame_count += 1
+        return True
+
+
+class MirrorBackend(OutputBackend):
+    # Frames posted by the display loop are streamed to the configurator page.
+    DEFAULT_URL = 'http://127.0.0.1:5000/frames'
+
+    def __init__(self, backend: OutputBackend, url: str = DEFAULT_URL, timeout: float = 2):
+        self.backend = backend
+        self.needs_file = backend.needs_file
+        self.url = url
+        self.timeout = timeout
+        # Only the newest frame waits, so a slow or missing configurator never holds the display loop.
+        self.pending: queue.Queue = queue.Queue(maxsize=1)
+        self.reachable = True
+        self.worker = threading.Thread(target=self.post_frames, name='frame-mirror', daemon=True)
+        self.worker.start()
+
+    def show(self, frame, command, label=''):
+        if frame is not None:
+            try:
+                self.pending.get_nowait()
+            except queue.Empty:
+                pass
+            self.pending.put_nowait(frame.copy())
+        return self.backend.show(frame, command, label)
+
+    def wait(self, wake_up, seconds):
+        return self.backend.wait(wake_up, seconds)
+
+    def post_frames(self):
+        import requests
+        from PIL import Image
+        session = requests.Session()
+        while True:
+            frame = self.pending.get()
+            if frame is None:
+                return
+            buffer = io.BytesIO()
+            Image.fromarray(frame).save(buffer, format='PNG')
+            try:
+                session.post(self.url, data=buffer.getvalue(), headers={'Content-Type': 'image/png'}, timeout=self.timeout).raise_for_status()
+                self.reachable = True
+            except requests.exceptions.RequestException as e:
+                # Logged once, the configurator does not have to run.
+                if self.reachable:
+                    logging.warning(f"Could not mirror the frame to {self.url}: {e}")
+                self.reachable = False
+
+    def close(self):
+        try:
+            self.pending.get_nowait()
+        except queue.Empty:
+            pass
+        self.pending.put_nowait(None)
+        self.backend.close()
+
+
+BACKENDS = {
+    'led matrix': LedMatrixBackend,
+    'preview': PreviewBackend,
+    'terminal': TerminalBackend,
+    'null': NullBackend,
+}
+
+def create_backend(image_out: str, mirror_url: Optional[str] = None) -> OutputBackend:
+    backend = BACKENDS.get(image_out)
+    if backend is None:
+        # Any other value meant the OpenCV preview window before backends existed.
+        logging.info(f"Unknown image out '{image_out}', using the preview window.")
+        backend = PreviewBackend
+    if mirror_url:
+        return MirrorBackend(backend(), mirror_url)
+    return backend()
@@ -4,20 +4,19 @@ import math
 from typing import List
 import numpy as np
 import png
-import pytz
 from PIL import Image
 import os
 from patterns import digit_patterns, arrow_patterns, signal_patterns
 from util import Color, EntrieEnum, GlucoseItem, TreatmentEnum
 
 class PixelMatrix:
-    def __init__(self, matrix_size: int, min_glucose: int, max_glucose: int, GLUCOSE_LOW, GLUCOSE_HIGH, night_brightness):
+    def __init__(self, matrix_size: int, min_glucose: int, max_glucose: int, GLUCOSE_LOW, GLUCOSE_HIGH, brightness: float = 1.0):
         self.min_glucose = min_glucose
         self.matrix_size = matrix_size
         self.max_glucose = max_glucose
         self.GLUCOSE_LOW = GLUCOSE_LOW
         self.GLUCOSE_HIGH = GLUCOSE_HIGH
-        self.night_brightness = night_brightness
+        self.brightness = brightness
         self.pixels = [[[0, 0, 0] for _ in range(matrix_size)] for _ in range(matrix_size)]
 
     def set_formmated_entries(self, formmated_entries):
@@ -219,7 +218,7 @@ class PixelMatrix:
                 self.set_pixel(x, y, r, g, b)
 
     def get_low_brightness_pixels(self):
-        brightness = self.get_brightness_on_hour()
+        brightness = self.brightness
         low_brightness_pixels = [[[0, 0, 0] for _ in range(self.matrix_size)] for _ in range(self.matrix_size)]
 
         for x in range(0, self.matrix_size):
@@ -228,11 +227,14 @@ class PixelMatrix:
 
         return low_brightness_pixels
 
+    def get_frame(self) -> np.ndarray:
+        pixels = self.get_low_brightness_pixels() if self.brightness != 1.0 else self.pixels
+        return np.array(pixels, dtype=np.uint8)
+
     def generate_image(self, output_file="output_image.png"):
         logging.info("Generating image.")
-        brightness = self.get_brightness_on_hour()
 
-        if brightness != 1.0:
+        if self.brightness != 1.0:
             low_brightness_pixels = self.get_low_brightness_pixels()
             png_matrix = []
             for row in low_brightness_pixels:
@@ -276,16 +278,6 @@ class PixelMatrix:
         normalized = (glucose - self.min_glucose) / (self.max_glucose - self.min_glucose)
         return int((1 - normalized) * available_y_range) + 5
 
-    def get_brightness_on_hour(self, timezone_str="America/Recife") -> float:
-        local_tz = pytz.timezone(timezone_str)
-        current_time = datetime.now(local_tz)
-        current_hour = current_time.hour
-
-        if 21 <= current_hour or current_hour < 6:
-            return self.night_brightness
-        else:
-            return 1.0
-        
     def determine_color(self, glucose: int, entry_type=EntrieEnum) -> List[int]:
         if entry_type == EntrieEnum.MBG:
             return Color.white
@@ -0,0 +1,67 @@
+import io
+import logging
+import os
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+MATRIX_SIZES = (16, 32, 64)
+# The only images the display draws, logo and demo images in the same folder are left alone.
+STATUS_SCREENS = ('nocgmdata', 'no_wifi')
+
+class StatusScreenCache:
+    def __init__(self, images_dir: str = 'images', cache_dir: str = os.path.join('temp', 'status'), sizes: Iterable[int] = MATRIX_SIZES,
+                 names: Iterable[str] = STATUS_SCREENS):
+        self.images_dir = images_dir
+        self.names = tuple(names)
+        self.cache_dir = cache_dir
+        self.sizes = tuple(sizes)
+        self.paths: Dict[Tuple[str, int], str] = {}
+        self.payloads: Dict[Tuple[str, int], bytes] = {}
+        self.frames: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def preload(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for name in self.names:
+            file_name = f"{name}.png"
+            try:
+                with Image.open(os.path.join(self.images_dir, file_name)) as img:
+                    # The panel has no alpha channel, so transparent areas are flattened onto black once here.
+                    source = Image.alpha_composite(Image.new('RGBA', img.size, (0, 0, 0, 255)), img.convert('RGBA')).convert('RGB')
+                for size in self.sizes:
+                    frame = self.resize(source, size)
+                    self.frames[(name, size)] = np.asarray(frame)
+                    self.store(name, size, self.encode(frame))
+            except OSError as e:
+                logging.error(f"Could not preload status screen {file_name}: {e}")
+        logging.info(f"Preloaded {len(self.paths)} status screens into {self.cache_dir}.")
+
+    def resize(self, source: Image.Image, size: int) -> Image.Image:
+        return source if source.size == (size, size) else source.resize((size, size), Image.LANCZOS)
+
+    def encode(self, frame: Image.Image) -> bytes:
+        buffer = io.BytesIO()
+        frame.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+    def store(self, name: str, size: int, payload: bytes):
+        path = os.path.join(self.cache_dir, f"{name}-{size}.png")
+        # Skip the write when an identical file survived from a previous run.
+        if not os.path.exists(path) or os.path.getsize(path) != len(payload) or self.read(path) != payload:
+            with open(path, 'wb') as file:
+                file.write(payload)
+        self.paths[(name, size)] = path
+        self.payloads[(name, size)] = payload
+
+    def read(self, path: str) -> bytes:
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def get_path(self, name: str, size: int) -> Optional[str]:
+        return self.paths.get((name, size))
+
+    def get_payload(self, name: str, size: int) -> Optional[bytes]:
+        return self.payloads.get((name, size))
+
+    def get_frame(self, name: str, size: int) -> Optional[np.ndarray]:
+        return self.frames.get((name, size))
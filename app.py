@@ -2,9 +2,13 @@
 import argparse
 import asyncio
 import logging
+import os
+import sys
 
 # idotmatrix imports
 from core.cmd import CMD
+from core import batch
+from core import daemon
 
 
 def log():
@@ -21,8 +25,7 @@ def log():
     logging.getLogger("bleak").setLevel(logging.WARNING)
 
 
-def main():
-    cmd = CMD()
+def create_parser(cmd):
     parser = argparse.ArgumentParser(
         description="control all your 16x16 or 32x32 pixel displays"
     )
@@ -32,10 +35,58 @@ def main():
         action="store",
         help="the bluetooth address of the device",
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keeps running and executes the commands of other app.py calls over a local socket",
+    )
+    parser.add_argument(
+        "--background-scan",
+        action="store_true",
+        help="lets the daemon scan for devices every minute so --address auto can connect right away",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="runs the command in this process even if a daemon is running",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store",
+        help="runs the commands of a file (or - for stdin) one per line over a single connection",
+    )
     # add cmd arguments
     cmd.add_arguments(parser)
+    return parser
+
+
+def main():
+    cmd = CMD()
+    parser = create_parser(cmd)
     # parse arguments
     args = parser.parse_args()
+    # run daemon
+    if args.daemon:
+        if not daemon.is_supported():
+            logging.getLogger("idotmatrix").error("the daemon needs unix domain sockets")
+            sys.exit(1)
+        asyncio.run(daemon.DeviceDaemon(cmd, parser, background_scan=args.background_scan).serve())
+        return
+    # forward to a running daemon, frames on stdin can only be read by this process
+    if not args.no_daemon and not args.batch and args.pixel_file != "-":
+        arguments = sys.argv[1:]
+        if not args.address and "IDOTMATRIX_ADDRESS" in os.environ:
+            arguments += ["--address", os.environ["IDOTMATRIX_ADDRESS"]]
+        code = daemon.forward(arguments)
+        if code is not None:
+            sys.exit(code)
+    # run batch
+    if args.batch:
+        with batch.open_source(args.batch) as source:
+            failed = asyncio.run(batch.run(cmd, parser, source, args.address))
+        if failed:
+            sys.exit(1)
+        return
     # run command
     asyncio.run(cmd.run(args))
 
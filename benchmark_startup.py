@@ -0,0 +1,64 @@
+# python imports
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# modules which must not be imported before a command really talks to a device
+HEAVY_MODULES = ("idotmatrix", "bleak", "PIL", "numpy")
+
+CASES = {
+    "python": ["-c", "pass"],
+    "import app": ["-c", "import app"],
+    "app.py --help": ["app.py", "--no-daemon", "--help"],
+    "import idotmatrix": ["-c", "import idotmatrix"],
+}
+
+
+def measure(arguments, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + arguments,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def heavy_imports():
+    """returns the heavy modules which are loaded by just importing the app"""
+    check = (
+        "import sys, app; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="measures the cold start time of app.py")
+    parser.add_argument("--runs", type=int, default=10, help="runs per case, the median is reported")
+    args = parser.parse_args()
+    for name, arguments in CASES.items():
+        print(f"{name:<20} {measure(arguments, args.runs) * 1000:8.1f} ms")
+    loaded = heavy_imports()
+    if loaded:
+        print(f"importing app.py loads {', '.join(loaded)}, they should only be imported by the commands using them")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# python imports
+from collections import OrderedDict
+import logging
+import os
+from typing import Callable, Optional
+
+# state imports
+from core.device_state import content_hash
+
+# processed assets shared by every app.py process on this machine
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "temp", "asset_cache"
+)
+MAX_DISK_SIZE = 32 * 1024 * 1024
+MAX_MEMORY_SIZE = 4 * 1024 * 1024
+
+
+class AssetCache:
+    """content addressed cache for processed images and gifs.
+    Entries are keyed by the hash of the source file plus everything that influences the
+    processing, kept in an in-memory LRU and on disk, and evicted by total size.
+    """
+
+    logging = logging.getLogger("idotmatrix." + __name__)
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        max_disk_size: int = MAX_DISK_SIZE,
+        max_memory_size: int = MAX_MEMORY_SIZE,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_disk_size = max_disk_size
+        self.max_memory_size = max_memory_size
+        self.memory: OrderedDict = OrderedDict()
+        self.memory_size = 0
+
+    @staticmethod
+    def key(source_hash: str, *options) -> str:
+        """returns the cache key of a source file processed with the given options"""
+        return content_hash(source_hash.encode("utf8"), *options)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.memory.get(key)
+        if data is not None:
+            self.memory.move_to_end(key)
+            return data
+        try:
+            with open(self.path(key), "rb") as file:
+                data = file.read()
+            # the modification time doubles as last access time for the disk eviction
+            os.utime(self.path(key))
+        except OSError:
+            return None
+        self.remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.remember(key, data)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = self.path(key) + ".tmp"
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, self.path(key))
+            self.evict_disk()
+        except OSError as error:
+            self.logging.warning(f"could not write asset cache entry: {error}")
+
+    def get_or_create(self, key: str, create: Callable[[], bytes]) -> bytes:
+        """returns the cached asset or creates and stores it"""
+        data = self.get(key)
+        if data is not None:
+            self.logging.info("using cached processed asset")
+            return data
+        data = create()
+        self.put(key, data)
+        return data
+
+    def remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_memory_size:
+            return
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.max_memory_size:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def evict_disk(self) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            stat = os.stat(self.path(name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_size:
+                break
+            os.remove(self.path(name))
+            total -= size
@@ -0,0 +1,103 @@
+# python imports
+import asyncio
+import contextlib
+import json
+import logging
+import shlex
+import sys
+import time
+from typing import ContextManager, Iterator, List, Optional, TextIO, Tuple
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def parse_line(line: str) -> Optional[List[str]]:
+    """turns one batch line into app.py arguments.
+    A line is either a JSON list of arguments, a JSON object mapping option names to values
+    (null for options without value) or the same arguments as on the command line.
+    Empty lines and lines starting with # are ignored.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("["):
+        return [str(argument) for argument in json.loads(line)]
+    if line.startswith("{"):
+        arguments = []
+        for option, value in json.loads(line).items():
+            option = option if option.startswith("--") else "--" + option.replace("_", "-")
+            arguments.append(option)
+            if isinstance(value, bool):
+                arguments.append(str(value).lower())
+            elif isinstance(value, list):
+                arguments.extend(str(item) for item in value)
+            elif value is not None:
+                arguments.append(str(value))
+        return arguments
+    return shlex.split(line)
+
+
+def read_commands(source: TextIO) -> Iterator[Tuple[int, List[str]]]:
+    """yields the line number and arguments of every command in a batch file"""
+    for number, line in enumerate(source, start=1):
+        try:
+            arguments = parse_line(line)
+        except ValueError as error:
+            logger.error(f"line {number}: could not parse command: {error}")
+            continue
+        if arguments:
+            yield number, arguments
+
+
+async def run(cmd, parser, source: TextIO, address: Optional[str] = None) -> int:
+    """runs every command of a batch over one connection, returns the number of failed commands.
+    Lines without --address use the given address, and "sleep SECONDS" pauses between steps.
+    """
+    failed = 0
+    count = 0
+    started = time.perf_counter()
+    # read up front, a failing command must not be able to cut the batch short by closing stdin
+    commands = list(read_commands(source))
+    try:
+        for number, arguments in commands:
+            if arguments[0] == "sleep":
+                await asyncio.sleep(float(arguments[1]) if len(arguments) > 1 else 1)
+                continue
+            count += 1
+            command_started = time.perf_counter()
+            try:
+                args = parser.parse_args(arguments)
+                if args.batch:
+                    raise ValueError("batches can not be nested")
+                if args.address is None:
+                    args.address = address
+                await cmd.run(args)
+                # resolve "auto" once, later commands reuse the found device
+                if address is None or str(address).lower() == "auto":
+                    address = cmd.address
+                ok = True
+            except SystemExit as error:
+                # argparse and the commands leave with SystemExit on errors, sys.exit() means done
+                ok = error.code in (None, 0)
+            except Exception as error:
+                logger.error(f"line {number}: {error}")
+                ok = False
+            elapsed = time.perf_counter() - command_started
+            if ok:
+                logger.info(f"line {number}: {' '.join(arguments)} finished in {elapsed:.2f}s")
+            else:
+                failed += 1
+                logger.error(f"line {number}: {' '.join(arguments)} failed after {elapsed:.2f}s")
+    finally:
+        await cmd.connections.disconnect_all()
+    logger.info(
+        f"batch finished {count} commands in {time.perf_counter() - started:.2f}s, {failed} failed"
+    )
+    return failed
+
+
+def open_source(path: str) -> ContextManager[TextIO]:
+    """opens a batch file, - reads the commands from stdin and leaves it open"""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, "r", encoding="utf8")
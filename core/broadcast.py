@@ -0,0 +1,150 @@
+# python imports
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+# client imports
+from core import commands
+
+# groups of panels live in their own file, the configurator only handles flat text settings
+GROUPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "device_groups.json")
+# bluez handles only a few connection attempts at the same time
+MAX_PARALLEL_CONNECTS = 4
+# pause between two writes, same as the ConnectionManager of the idotmatrix library
+WRITE_DELAY = 0.01
+# state key of the recorded command, it never reaches a real device
+RECORDING_ADDRESS = "BROADCAST"
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+class RecordingClient:
+    """stands in for a BleakClient and keeps every write instead of sending it"""
+
+    is_connected = True
+
+    def __init__(self) -> None:
+        self.writes: List[Tuple[str, bytes, bool]] = []
+
+    async def connect(self) -> None:
+        pass
+
+    async def write_gatt_char(self, characteristic, data, response=False) -> None:
+        self.writes.append((characteristic, bytes(data), response))
+
+
+def load_groups(path: str = GROUPS_PATH) -> Dict[str, List[str]]:
+    """reads the group names and their addresses, groups which are not a list of addresses are skipped"""
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except ValueError as error:
+        logger.warning(f"could not read device groups: {error}")
+        return {}
+    if not isinstance(data, dict):
+        logger.warning(f"ignoring device groups: {path} has to contain an object of group names")
+        return {}
+    groups = {}
+    for name, addresses in data.items():
+        if not isinstance(addresses, list) or not all(isinstance(address, str) for address in addresses):
+            logger.warning(f"ignoring device group {name}: it has to be a list of addresses")
+            continue
+        groups[name] = addresses
+    return groups
+
+
+def resolve_addresses(targets: List[str], groups: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """expands group names and comma separated lists into unique device addresses"""
+    if groups is None:
+        groups = load_groups()
+    addresses = []
+    for target in targets:
+        for entry in target.split(","):
+            entry = entry.strip()
+            for address in groups.get(entry, [entry] if entry else []):
+                if address.upper() not in (known.upper() for known in addresses):
+                    addresses.append(address)
+    return addresses
+
+
+async def record(cmd, args) -> List[Tuple[str, bytes, bool]]:
+    """runs the command once against a recording client and returns everything it would send"""
+    recorder = RecordingClient()
+    cmd.connections.release()
+    conn = cmd.connections.conn
+    conn.address = RECORDING_ADDRESS
+    conn.client = recorder
+    cmd.address = RECORDING_ADDRESS
+    # every panel gets the full command, so nothing may be skipped by a remembered state
+    cmd.state.invalidate(RECORDING_ADDRESS)
+    try:
+        await cmd.execute(args)
+    finally:
+        conn.address = None
+        conn.client = None
+    return recorder.writes
+
+
+async def replay(connections, address: str, writes, connect_slots: asyncio.Semaphore) -> float:
+    """sends recorded writes to one device, returns the seconds it took"""
+    from bleak import BleakClient
+
+    started = time.perf_counter()
+    client = connections.clients.get(address.upper())
+    if client is None:
+        client = BleakClient(address)
+        connections.clients[address.upper()] = client
+    if not client.is_connected:
+        async with connect_slots:
+            await client.connect()
+        logger.info(f"connected to {address}")
+    for characteristic, data, response in writes:
+        await client.write_gatt_char(characteristic, data, response)
+        await asyncio.sleep(WRITE_DELAY)
+    return time.perf_counter() - started
+
+
+async def run(cmd, args) -> bool:
+    """prepares the command once and sends it to all given panels at the same time"""
+    addresses = resolve_addresses(args.broadcast)
+    if not addresses:
+        logger.error("no device address given for --broadcast")
+        return False
+    writes = await record(cmd, args)
+    recorded = cmd.state.get(RECORDING_ADDRESS)
+    cmd.state.invalidate(RECORDING_ADDRESS)
+    # settings the command did not touch keep their remembered value on every panel
+    changes = {field: getattr(recorded, field) for field in recorded.FIELDS if getattr(recorded, field) is not None}
+    if args.test or any(command.EXCLUSIVE for command in commands.requested(args)):
+        changes["mode"] = recorded.mode
+        changes["content_hash"] = recorded.content_hash
+    if not writes:
+        logger.info("nothing to send")
+        return True
+    logger.info(
+        f"sending {len(writes)} writes ({sum(len(data) for _, data, _ in writes)} bytes) to {len(addresses)} devices"
+    )
+    started = time.perf_counter()
+    connect_slots = asyncio.Semaphore(MAX_PARALLEL_CONNECTS)
+    results = await asyncio.gather(
+        *(replay(cmd.connections, address, writes, connect_slots) for address in addresses),
+        return_exceptions=True,
+    )
+    failed = 0
+    for address, result in zip(addresses, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            logger.error(f"{address}: failed: {result}")
+            cmd.state.invalidate(address)
+        else:
+            logger.info(f"{address}: done in {result:.2f}s")
+            cmd.state.update(address, **changes)
+    logger.info(
+        f"broadcast to {len(addresses) - failed}/{len(addresses)} devices took {time.perf_counter() - started:.2f}s"
+    )
+    return failed == 0
@@ -0,0 +1,179 @@
+# python imports
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# commands which only change a setting are sent before anything that replaces the screen content,
+# everything that replaces the screen keeps the order it was submitted in
+PRIORITY_SETTING = 0
+PRIORITY_SCREEN = 1
+
+SETTING_FLAGS = (
+    "--set-brightness",
+    "--screen",
+    "--flip-screen",
+    "--toggle-screen-freeze",
+    "--set-password",
+    "--sync-time",
+)
+SCREEN_FLAGS = (
+    "--image",
+    "--set-image",
+    "--set-gif",
+    "--set-text",
+    "--pixel-color",
+    "--pixel-file",
+    "--fullscreen-color",
+    "--clock",
+    "--chronograph",
+    "--countdown",
+    "--scoreboard",
+    "--test",
+)
+# a command supersedes a pending one with exactly the same of these flags
+ACTION_FLAGS = SETTING_FLAGS + SCREEN_FLAGS
+
+
+def classify(args: List[str]):
+    """returns the priority and the coalescing key of a command line"""
+    flags = {arg.split("=", 1)[0] for arg in args if arg.startswith("--")}
+    # the whole set of flags, so "--set-brightness --set-image" is not replaced by a brightness change
+    key = tuple(flag for flag in ACTION_FLAGS if flag in flags) or None
+    # a setting combined with a screen change keeps the place of the screen change
+    if key is not None and all(flag in SETTING_FLAGS for flag in key):
+        return PRIORITY_SETTING, key
+    return PRIORITY_SCREEN, key
+
+
+class DeviceCommand:
+    """a single app.py command line waiting to be sent to a device"""
+
+    def __init__(self, address: str, args: List[str], priority: int, key: Optional[Tuple[str, ...]], sequence: int) -> None:
+        self.address = address
+        self.args = args
+        self.priority = priority
+        self.key = key
+        self.sequence = sequence
+        self.cancelled = False
+
+    def __lt__(self, other: "DeviceCommand") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class CommandLogHandler(logging.Handler):
+    """forwards log records of the running command to the queue listener"""
+
+    def __init__(self, queue: "DeviceCommandQueue") -> None:
+        super().__init__(logging.INFO)
+        self.queue = queue
+        self.command: Optional[DeviceCommand] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.command is not None:
+            self.queue.notify(self.command, "log", self.format(record))
+
+
+async def run_app_command(args: List[str]) -> None:
+    """runs an app.py command line inside the current process"""
+    from app import create_parser
+    from core.cmd import CMD
+
+    cmd = CMD()
+    await cmd.run(create_parser(cmd).parse_args(args))
+
+
+class DeviceCommandQueue:
+    """runs device commands on a background asyncio loop with one worker per device.
+    Pending commands are ordered by priority and a newer command replaces a pending one
+    with the same action, so quick interactions only send their final state.
+    """
+
+    logging = logging.getLogger("idotmatrix." + __name__)
+
+    def __init__(self, runner: Callable = run_app_command, listener: Optional[Callable] = None) -> None:
+        self.runner = runner
+        self.listener = listener
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="device-commands", daemon=True)
+        self.sequence = itertools.count()
+        self.pending: Dict[str, list] = {}
+        self.wakeups: Dict[str, asyncio.Event] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+        # all devices share the ConnectionManager of the idotmatrix library
+        self.bluetooth_lock: Optional[asyncio.Lock] = None
+        self.log_handler = CommandLogHandler(self)
+        self.log_handler.setFormatter(logging.Formatter("%(levelname)s :: %(message)s"))
+
+    def start(self) -> None:
+        if not self.thread.is_alive():
+            self.thread.start()
+            library_logger = logging.getLogger("idotmatrix")
+            if library_logger.level == logging.NOTSET:
+                library_logger.setLevel(logging.INFO)
+            library_logger.addHandler(self.log_handler)
+
+    def stop(self) -> None:
+        logging.getLogger("idotmatrix").removeHandler(self.log_handler)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def submit(self, address: str, args: List[str]) -> None:
+        """queues a command line for the given device, safe to call from any thread"""
+        self.start()
+        self.loop.call_soon_threadsafe(self._enqueue, address, list(args))
+
+    def notify(self, command: DeviceCommand, event: str, message: str = "") -> None:
+        if self.listener is not None:
+            self.listener(command.address, event, message)
+
+    def _enqueue(self, address: str, args: List[str]) -> None:
+        priority, key = classify(args)
+        command = DeviceCommand(address, args, priority, key, next(self.sequence))
+        pending = self.pending.setdefault(address, [])
+        if key is not None:
+            for queued in pending:
+                if queued.key == key and not queued.cancelled:
+                    queued.cancelled = True
+                    self.notify(queued, "superseded", " ".join(queued.args))
+        heapq.heappush(pending, command)
+        self.notify(command, "queued", " ".join(args))
+        if address not in self.workers:
+            self.wakeups[address] = asyncio.Event()
+            self.workers[address] = self.loop.create_task(self._work(address))
+        self.wakeups[address].set()
+
+    async def _work(self, address: str) -> None:
+        if self.bluetooth_lock is None:
+            self.bluetooth_lock = asyncio.Lock()
+        pending = self.pending[address]
+        wakeup = self.wakeups[address]
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            while pending:
+                command = heapq.heappop(pending)
+                if not command.cancelled:
+                    await self._execute(command)
+
+    async def _execute(self, command: DeviceCommand) -> None:
+        async with self.bluetooth_lock:
+            self.notify(command, "started", " ".join(command.args))
+            self.log_handler.command = command
+            start = time.perf_counter()
+            try:
+                await self.runner(command.args)
+                self.notify(command, "finished", f"{time.perf_counter() - start:.2f}s")
+            except SystemExit as error:
+                # app.py exits with an error code on invalid arguments
+                if error.code in (None, 0):
+                    self.notify(command, "finished", f"{time.perf_counter() - start:.2f}s")
+                else:
+                    self.notify(command, "failed", "invalid arguments")
+            except Exception as error:
+                self.logging.error(f"command for {command.address} failed: {error}")
+                self.notify(command, "failed", str(error))
+            finally:
+                self.log_handler.command = None
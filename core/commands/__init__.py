@@ -0,0 +1,50 @@
+# python imports
+import importlib
+from types import ModuleType
+from typing import Dict, List
+
+# command modules in the order they are listed and run.
+# Every module defines add_arguments(parser), is_requested(args) and an async run(cmd, args),
+# imports its heavy dependencies (idotmatrix, Pillow) only inside run and sets EXCLUSIVE
+# if it cannot be combined with other exclusive commands.
+MODULES = (
+    "device",
+    "chronograph",
+    "clock",
+    "countdown",
+    "fullscreen_color",
+    "pixel_color",
+    "scoreboard",
+    "image",
+    "gif",
+    "text",
+)
+
+_loaded: Dict[str, ModuleType] = {}
+
+
+def load(name: str) -> ModuleType:
+    if name not in _loaded:
+        _loaded[name] = importlib.import_module(f"{__name__}.{name}")
+    return _loaded[name]
+
+
+def add_arguments(parser) -> None:
+    for name in MODULES:
+        load(name).add_arguments(parser)
+
+
+def requested(args) -> List[ModuleType]:
+    """returns the commands to run for the parsed arguments: every combinable one and the first exclusive one"""
+    commands = []
+    exclusive = False
+    for name in MODULES:
+        command = load(name)
+        if not command.is_requested(args):
+            continue
+        if command.EXCLUSIVE:
+            if exclusive:
+                continue
+            exclusive = True
+        commands.append(command)
+    return commands
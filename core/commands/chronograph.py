@@ -0,0 +1,32 @@
+# python imports
+import logging
+import sys
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--chronograph",
+        action="store",
+        help="sets the chronograph mode: 0 = reset, 1 = (re)start, 2 = pause, 3 = continue after pause",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.chronograph)
+
+
+async def run(cmd, args):
+    """sets the chronograph mode"""
+    from idotmatrix import Chronograph
+
+    logger.info("setting chronograph mode")
+    if int(args.chronograph) in range(0, 4):
+        await Chronograph().setMode(int(args.chronograph))
+        cmd.remember_mode("chronograph")
+    else:
+        logger.error("wrong argument for chronograph mode")
+        sys.exit(1)
@@ -0,0 +1,59 @@
+# python imports
+import logging
+import sys
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--clock",
+        action="store",
+        help="sets the clock mode: 0 = default, 1 = christmas, 2 = racing, 3 = inverted full screen, 4 = animated hourglass, 5 = frame 1, 6 = frame 2, 7 = frame 3",
+    )
+    parser.add_argument(
+        "--clock-with-date",
+        action="store_true",
+        help="shows the current date in addition to the current time.",
+    )
+    parser.add_argument(
+        "--clock-24h",
+        action="store_true",
+        help="shows the current time in 24h format.",
+    )
+    parser.add_argument(
+        "--clock-color",
+        action="store",
+        help="sets the color of the clock. Format: <R0-255>-<G0-255>-<B0-255> (example: 255-255-255)",
+        default="255-255-255",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.clock)
+
+
+async def run(cmd, args):
+    """sets the clock mode"""
+    from idotmatrix import Clock
+
+    logger.info("setting clock mode")
+    if int(args.clock) in range(0, 8):
+        color = args.clock_color.split("-")
+        if len(color) < 3:
+            logger.error("wrong argument for --clock-color")
+            sys.exit(1)
+        await Clock().setMode(
+            style=int(args.clock),
+            visibleDate=args.clock_with_date,
+            hour24=args.clock_24h,
+            r=int(color[0]),
+            g=int(color[1]),
+            b=int(color[2]),
+        )
+        cmd.remember_mode("clock")
+    else:
+        logger.error("wrong argument for --clock")
+        sys.exit(1)
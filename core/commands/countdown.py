@@ -0,0 +1,61 @@
+# python imports
+import logging
+import sys
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--countdown",
+        action="store",
+        help="sets the countdown mode: 0 = disable, 1 = start, 2 = pause, 3 = restart",
+    )
+    parser.add_argument(
+        "--countdown-time",
+        action="store",
+        type=str,
+        help="sets the countdown mode: <MINUTES>-<SECONDS> (example: 10-30)",
+        default="5-0",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.countdown)
+
+
+async def run(cmd, args):
+    """sets the countdown mode"""
+    from idotmatrix import Countdown
+
+    logger.info("setting countdown mode")
+    mode = int(args.countdown)
+    if mode not in range(0, 4):
+        logger.error("wrong argument for --countdown")
+        sys.exit(1)
+    times = args.countdown_time.split("-")
+    if not len(times) == 2:
+        logger.error("wrong argument for --countdown-time")
+        sys.exit(1)
+    minutes, seconds = [int(x) for x in times]
+    if minutes not in range(0, 100):
+        logger.error(
+            "wrong argument for --countdown-time - minutes must be between 0 and 99"
+        )
+        sys.exit(1)
+    if seconds not in range(0, 60):
+        logger.error(
+            "wrong argument for --countdown-time - seconds must be between 0 and 59"
+        )
+        sys.exit(1)
+    if minutes == 0 and seconds == 0:
+        logger.error("wrong argument for --countdown-time - time cannot be zero")
+        sys.exit(1)
+    await Countdown().setMode(
+        mode=mode,
+        minutes=minutes,
+        seconds=seconds,
+    )
+    cmd.remember_mode("countdown")
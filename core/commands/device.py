@@ -0,0 +1,174 @@
+# python imports
+from datetime import datetime
+import logging
+import sys
+
+EXCLUSIVE = False
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    # time sync
+    parser.add_argument(
+        "--sync-time",
+        action="store_true",
+        help="sync time to device",
+    )
+    parser.add_argument(
+        "--set-time",
+        action="store",
+        help="optionally set time to sync to device (use with --sync-time, default: the time the command runs)",
+    )
+    # device screen rotation
+    parser.add_argument(
+        "--flip-screen",
+        type=str,
+        choices=["true", "false"],
+        help="flips screen (true = flip, false = normal)",
+    )
+    # screen toggle
+    parser.add_argument(
+        "--toggle-screen-freeze",
+        action="store_true",
+        help="freezes or unfreezes the screen",
+    )
+    # enable or disable device screen
+    parser.add_argument(
+        "--screen",
+        type=str,
+        choices=["on", "off"],
+        help="turns screen on or off",
+    )
+    # brightness
+    parser.add_argument(
+        "--set-brightness",
+        action="store",
+        help="sets the brightness of the screen in percent: range 5..100",
+    )
+    # password
+    parser.add_argument(
+        "--set-password",
+        action="store",
+        help="sets password",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(
+        args.sync_time
+        or args.flip_screen
+        or args.toggle_screen_freeze
+        or args.screen
+        or args.set_brightness
+        or args.set_password
+    )
+
+
+async def run(cmd, args):
+    # arguments which can be run in parallel
+    if args.sync_time:
+        await sync_time(args.set_time)
+    if args.flip_screen:
+        await flip_screen(cmd, args.flip_screen)
+    if args.toggle_screen_freeze:
+        await toggle_screen_freeze()
+    if args.screen:
+        await screen(cmd, args.screen)
+    if args.set_brightness:
+        await set_brightness(cmd, int(args.set_brightness))
+    if args.set_password:
+        await set_password(args.set_password)
+
+
+async def sync_time(argument):
+    """Synchronize local time to device"""
+    from idotmatrix import Common
+
+    logger.info("starting to synchronize time")
+    # resolved here, a parser reused by the daemon or a batch would otherwise keep the time it was built at
+    if argument is None:
+        argument = datetime.now().strftime("%d-%m-%Y-%H:%M:%S")
+    try:
+        date = datetime.strptime(argument, "%d-%m-%Y-%H:%M:%S")
+    except ValueError:
+        logger.error("wrong format of --set-time: please use dd-mm-YYYY-HH-MM-SS")
+        sys.exit(1)
+    await Common().setTime(
+        date.year,
+        date.month,
+        date.day,
+        date.hour,
+        date.minute,
+        date.second,
+    )
+
+
+async def flip_screen(cmd, argument: str) -> None:
+    """flip device screen 180 degrees"""
+    from idotmatrix import Common
+
+    flip = argument.upper() == "TRUE"
+    if cmd.state.get(cmd.address).flipped == flip:
+        logger.info("screen is already flipped that way, skipping")
+        return
+    logger.info("flipping screen")
+    if await Common().flipScreen(flip):
+        cmd.state.update(cmd.address, flipped=flip)
+
+
+async def toggle_screen_freeze() -> None:
+    """toggles the screen freeze"""
+    from idotmatrix import Common
+
+    logger.info("toggling screen freeze")
+    await Common().freezeScreen()
+
+
+async def screen(cmd, argument: str) -> None:
+    """turns the screen on or off"""
+    from idotmatrix import Common
+
+    screen_on = argument.upper() == "ON"
+    if cmd.state.get(cmd.address).screen_on == screen_on:
+        logger.info(f"screen is already {argument.lower()}, skipping")
+        return
+    if screen_on:
+        logger.info("turning screen on")
+        await Common().screenOn()
+    else:
+        logger.info("turning screen off")
+        await Common().screenOff()
+    cmd.state.update(cmd.address, screen_on=screen_on)
+
+
+async def set_brightness(cmd, argument: int) -> None:
+    """sets the brightness of the screen"""
+    from idotmatrix import Common
+
+    if argument in range(5, 101):
+        if cmd.state.get(cmd.address).brightness == argument:
+            logger.info(f"brightness is already {argument}%, skipping")
+            return
+        logger.info(f"setting brightness of the screen: {argument}%")
+        if await Common().setBrightness(argument):
+            cmd.state.update(cmd.address, brightness=argument)
+    else:
+        logger.error("brightness out of range (should be between 5 and 100)")
+
+
+async def set_password(argument: str) -> None:
+    """sets connection password"""
+    from idotmatrix import Common
+
+    try:
+        conv_password = int(argument)
+        if len(argument) == 6 and conv_password in range(0, 1000000):
+            logger.info(f"setting password: {argument}")
+            await Common().setPassword(conv_password)
+        else:
+            logger.error(
+                f"Password should be 6 digits long and in range 000000...999999"
+            )
+    except ValueError:
+        logger.error(f"Invalid integer: {argument}")
@@ -0,0 +1,36 @@
+# python imports
+import logging
+import sys
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--fullscreen-color",
+        action="store",
+        help="sets a fullscreen color. Format: <R0-255>-<G0-255>-<B0-255> (example: 255-255-255)",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.fullscreen_color)
+
+
+async def run(cmd, args):
+    """sets a given fullscreen color"""
+    from idotmatrix import FullscreenColor
+
+    logger.info("setting fullscreen color")
+    color = args.fullscreen_color.split("-")
+    if len(color) != 3:
+        logger.error("wrong argument for --fullscreen-color")
+        sys.exit(1)
+    await FullscreenColor().setMode(
+        int(color[0]),
+        int(color[1]),
+        color[2],
+    )
+    cmd.remember_mode("fullscreen_color")
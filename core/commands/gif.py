@@ -0,0 +1,57 @@
+# python imports
+import logging
+
+# client imports
+from core.device_state import content_hash, file_hash
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--set-gif",
+        action="store",
+        help="uploads a given gif file (pixel depending on your display). Format: ./path/to/image.gif",
+    )
+    parser.add_argument(
+        "--process-gif",
+        action="store",
+        help="processes the gif instead of sending it raw (useful when the size does not match). Format: <AMOUNT_PIXEL>",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.set_gif)
+
+
+async def run(cmd, args):
+    """enables or disables the gif mode and uploads a given gif file"""
+    from idotmatrix import Gif
+    from core import gif_stream
+
+    logger.info("setting (animated) GIF")
+    gif = Gif()
+    state = cmd.state.get(cmd.address)
+    source_hash = file_hash(args.set_gif)
+    upload_hash = content_hash(source_hash.encode("utf8"), args.process_gif)
+    if state.mode == "gif" and state.content_hash == upload_hash:
+        logger.info("gif is already shown on the device, skipping upload")
+        return
+    if args.process_gif:
+        pixel_size = int(args.process_gif)
+        gif_data = cmd.assets.get_or_create(
+            cmd.assets.key(source_hash, "gif", pixel_size, gif_stream.MAX_GIF_SIZE),
+            lambda: gif_stream.process_gif(
+                file_path=args.set_gif,
+                pixel_size=pixel_size,
+            ),
+        )
+        uploaded = await gif_stream.upload(gif_data)
+    else:
+        uploaded = await gif.uploadUnprocessed(
+            file_path=args.set_gif,
+        )
+    if uploaded:
+        cmd.state.update(cmd.address, mode="gif", content_hash=upload_hash)
@@ -0,0 +1,76 @@
+# python imports
+import logging
+
+# client imports
+from core.device_state import content_hash, file_hash
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--image",
+        action="store",
+        help="enables or disables the image mode (true = enable, false = disable)",
+    )
+    parser.add_argument(
+        "--set-image",
+        action="store",
+        help="uploads a given image file (fastest is png, max. pixel depending on your display). Format: ./path/to/image.png",
+    )
+    parser.add_argument(
+        "--process-image",
+        action="store",
+        help="processes the image instead of sending it raw (useful when the size does not match or it is not a png). Format: <AMOUNT_PIXEL>",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.image)
+
+
+async def run(cmd, args):
+    """enables or disables the image mode and uploads a given image file"""
+    from idotmatrix import Image
+    from core import image_processing
+
+    logger.info("setting image")
+    image = Image()
+    state = cmd.state.get(cmd.address)
+    if args.image == "false":
+        await image.setMode(
+            mode=0,
+        )
+        cmd.remember_mode(None)
+    else:
+        upload_hash = None
+        if args.set_image:
+            source_hash = file_hash(args.set_image)
+            upload_hash = content_hash(source_hash.encode("utf8"), args.process_image)
+            if state.mode == "image" and state.content_hash == upload_hash:
+                logger.info("image is already shown on the device, skipping upload")
+                return
+        if state.mode != "image":
+            if await image.setMode(
+                mode=1,
+            ):
+                cmd.remember_mode("image")
+        if args.set_image:
+            if args.process_image:
+                pixel_size = int(args.process_image)
+                png_data = cmd.assets.get_or_create(
+                    cmd.assets.key(source_hash, "image", pixel_size),
+                    lambda: image_processing.process_image(
+                        file_path=args.set_image,
+                        pixel_size=pixel_size,
+                    ),
+                )
+                uploaded = await image_processing.upload(png_data)
+            else:
+                uploaded = await image.uploadUnprocessed(
+                    file_path=args.set_image,
+                )
+            if uploaded:
+                cmd.state.update(cmd.address, content_hash=upload_hash)
@@ -0,0 +1,120 @@
+# python imports
+import logging
+import sys
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--pixel-color",
+        action="append",
+        help="sets a pixel to a specific color. Could be used multiple times. Format: <PIXEL-X>-<PIXEL-Y>-<R0-255>-<G0-255>-<B0-255> (example: 0-0-255-255-255)",
+        nargs="+",
+    )
+    parser.add_argument(
+        "--pixel-file",
+        action="store",
+        help="sets all pixels from a file: a .npy array, a png or a raw rgb/rgba buffer. Use - to read raw frames from stdin until it is closed. Format: ./path/to/frame.npy",
+    )
+    parser.add_argument(
+        "--pixel-size",
+        action="store",
+        type=int,
+        default=32,
+        help="size of the device in pixels, every --pixel-file frame has to match it. Format: <AMOUNT_PIXEL> (default: 32)",
+    )
+    parser.add_argument(
+        "--pixel-format",
+        action="store",
+        choices=("rgb", "rgba"),
+        help="byte layout of raw --pixel-file input (default: rgba for .rgba files, otherwise rgb)",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.pixel_color or args.pixel_file)
+
+
+async def send_frame(cmd, pixels, mask, frame_mask) -> None:
+    """sends the masked pixels one by one or the whole frame as image, whatever sends fewer bytes"""
+    from idotmatrix import Graffiti
+    from idotmatrix import Image
+    from core import image_processing, upload_planner
+
+    upload, data = upload_planner.plan_upload(pixels, mask, frame_mask)
+    if upload == "image":
+        if cmd.state.get(cmd.address).mode != "image" and await Image().setMode(mode=1):
+            cmd.remember_mode("image")
+        await image_processing.upload(data)
+        return
+    graffiti = Graffiti()
+    for x, y, r, g, b in data:
+        await graffiti.setPixel(x=x, y=y, r=r, g=g, b=b)
+    if data:
+        cmd.remember_mode("graffiti")
+
+
+async def run_file(cmd, args):
+    """sets the pixels of one frame file or of every frame read from stdin"""
+    import numpy as np
+    from core import pixel_input
+
+    try:
+        if args.pixel_file != "-":
+            pixels, alpha = pixel_input.load_frame(args.pixel_file, args.pixel_size, args.pixel_format)
+            mask = alpha if alpha is not None else np.ones(pixels.shape[:2], dtype=bool)
+            await send_frame(cmd, pixels, mask, mask)
+            return
+        previous = None
+        for count, (pixels, alpha) in enumerate(pixel_input.read_frames(sys.stdin.buffer, args.pixel_size, args.pixel_format), 1):
+            frame_mask = alpha if alpha is not None else np.ones(pixels.shape[:2], dtype=bool)
+            # alpha 0 turns a pixel off, like the image upload does, so a pixel which becomes transparent is sent as black
+            shown = np.where(frame_mask[..., None], pixels, 0).astype(np.uint8)
+            # after the first frame only the pixels which changed have to be sent
+            mask = frame_mask if previous is None else np.any(shown != previous, axis=2)
+            await send_frame(cmd, shown, mask, frame_mask)
+            previous = shown
+            logger.info(f"sent frame {count}")
+    except (OSError, ValueError) as error:
+        logger.error(f"could not read --pixel-file: {error}")
+        sys.exit(1)
+
+
+async def run(cmd, args):
+    """sets the given pixel colors"""
+    from idotmatrix import Graffiti
+
+    logger.info("setting pixel color")
+    if args.pixel_file:
+        await run_file(cmd, args)
+        if not args.pixel_color:
+            return
+    if len(args.pixel_color) <= 0:
+        logger.error("wrong argument for --pixel-color")
+        sys.exit(1)
+    pixels = []
+    # get all pixels to set
+    for params in args.pixel_color:
+        for pixel in params:
+            pixels.append(pixel)
+    # validate all pixels and send them
+    for pixel in pixels:
+        split = pixel.split("-")
+        # check if we got all data
+        if len(split) != 5:
+            logger.error("need exactly 5 arguments for a single pixel in --pixel-color")
+            sys.exit(1)
+        # TODO: proper check if we are within the pixel range of the device
+        # TODO: maybe we can use a delimiter to make use of the MTU size (sending chunks instead of separate requests)
+        # TODO: when filling 32x32 pixels it seems to have trouble to send all pixels. One pixel will be "forgotten" somehow
+        await Graffiti().setPixel(
+            x=int(split[0]),
+            y=int(split[1]),
+            r=int(split[2]),
+            g=int(split[3]),
+            b=int(split[4]),
+        )
+    cmd.remember_mode("graffiti")
@@ -0,0 +1,41 @@
+# python imports
+import logging
+import sys
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--scoreboard",
+        action="store",
+        help="shows the scoreboard with the given scores. Format: <0-999>-<0-999>",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.scoreboard)
+
+
+async def run(cmd, args):
+    """sets given score on the scoreboard and shows it"""
+    from idotmatrix import Scoreboard
+
+    logger.info("setting scoreboard mode")
+    scores = args.scoreboard.split("-")
+    if len(scores) != 2:
+        logger.error("wrong argument for --scoreboard")
+        sys.exit(1)
+    if int(scores[0]) < 0 or int(scores[1]) < 0:
+        logger.error("no negative values allowed for --scoreboard")
+        sys.exit(1)
+    if int(scores[0]) > 999 or int(scores[1]) > 999:
+        logger.error("exceeded maximum value of 999 for --scoreboard")
+        sys.exit(1)
+    await Scoreboard().setMode(
+        count1=int(scores[0]),
+        count2=int(scores[1]),
+    )
+    cmd.remember_mode("scoreboard")
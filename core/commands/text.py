@@ -0,0 +1,103 @@
+# python imports
+import logging
+import sys
+
+EXCLUSIVE = True
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--set-text",
+        action="store",
+        type=str,
+        help="sets the given text on your display.",
+    )
+    parser.add_argument(
+        "--text-font-path",
+        action="store",
+        type=str,
+        help="sets the given font for the text.",
+    )
+    parser.add_argument(
+        "--text-size",
+        action="store",
+        type=int,
+        help="Text size. Defaults to 16.",
+        default=16,
+    )
+    parser.add_argument(
+        "--text-mode",
+        action="store",
+        type=int,
+        help="Text mode. Defaults to 0. 0 = replace text, 1 = marquee, 2 = reversed marquee, 3 = vertical rising marquee, 4 = vertical lowering marquee, 5 = blinking, 6 = fading, 7 = tetris, 8 = filling",
+        default=0,
+    )
+    parser.add_argument(
+        "--text-speed",
+        action="store",
+        type=int,
+        help="speed (int, optional): Speed of Text. Defaults to 95.",
+        default=95,
+    )
+    parser.add_argument(
+        "--text-color-mode",
+        action="store",
+        type=int,
+        help="Text Color Mode. Defaults to 1. 0 = white, 1 = use given RGB color, 2,3,4,5 = rainbow modes",
+        default=1,
+    )
+    parser.add_argument(
+        "--text-color",
+        action="store",
+        type=str,
+        help="sets the text color. Format: <R0-255>-<G0-255>-<B0-255> (example: 255-255-255)",
+        default="255-0-0",
+    )
+    parser.add_argument(
+        "--text-bg-mode",
+        action="store",
+        type=int,
+        help="Text Background Mode. Defaults to 0. 0 = black, 1 = use given RGB color",
+        default=0,
+    )
+    parser.add_argument(
+        "--text-bg-color",
+        action="store",
+        type=str,
+        help="sets the text background color. Format: <R0-255>-<G0-255>-<B0-255> (example: 255-255-255)",
+        default="255-255-255",
+    )
+
+
+def is_requested(args) -> bool:
+    return bool(args.set_text)
+
+
+async def run(cmd, args):
+    """sets the given text on the device"""
+    from idotmatrix import Text
+
+    logger.info("setting text")
+    text = Text()
+    text_color = args.text_color.split("-")
+    if len(text_color) != 3:
+        logger.error("wrong argument for --text-color")
+        sys.exit(1)
+    bg_color = args.text_bg_color.split("-")
+    if len(bg_color) != 3:
+        logger.error("wrong argument for --text-bg-color")
+        sys.exit(1)
+    await text.setMode(
+        text=args.set_text,
+        font_size=args.text_size,
+        font_path=args.text_font_path,
+        text_mode=args.text_mode,
+        speed=args.text_speed,
+        text_color_mode=args.text_color_mode,
+        text_color=(int(text_color[0]), int(text_color[1]), int(text_color[2])),
+        text_bg_mode=args.text_bg_mode,
+        text_bg_color=(int(bg_color[0]), int(bg_color[1]), int(bg_color[2])),
+    )
+    cmd.remember_mode("text")
@@ -0,0 +1,53 @@
+# python imports
+import logging
+import sys
+from typing import Dict, Optional
+
+
+class ConnectionPool:
+    """keeps one bluetooth client per device address.
+    The idotmatrix modules always talk through the ConnectionManager singleton, so the pool
+    hands the client of the requested device to it instead of dropping the previous link.
+    """
+
+    logging = logging.getLogger("idotmatrix." + __name__)
+
+    def __init__(self) -> None:
+        self.clients: Dict[str, object] = {}
+
+    @property
+    def conn(self):
+        # bleak and the idotmatrix modules are only imported once a device is really used
+        from idotmatrix import ConnectionManager
+
+        return ConnectionManager()
+
+    def activate(self, address: Optional[str]) -> None:
+        """makes the given device the target of all following commands"""
+        current = self.conn.address
+        if current and address and current.upper() == address.upper():
+            return
+        self.release()
+        self.conn.address = address
+        if address:
+            self.conn.client = self.clients.get(address.upper())
+
+    def release(self) -> None:
+        """parks the active client so the ConnectionManager can be pointed elsewhere"""
+        if self.conn.address and self.conn.client is not None:
+            self.clients[self.conn.address.upper()] = self.conn.client
+        self.conn.address = None
+        self.conn.client = None
+
+    async def disconnect_all(self) -> None:
+        if not self.clients and "idotmatrix" not in sys.modules:
+            return
+        self.release()
+        for address, client in list(self.clients.items()):
+            try:
+                if client.is_connected:
+                    await client.disconnect()
+                    self.logging.info(f"disconnected from {address}")
+            except Exception as error:
+                self.logging.warning(f"could not disconnect from {address}: {error}")
+        self.clients = {}
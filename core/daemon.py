@@ -0,0 +1,164 @@
+# python imports
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+# socket the resident daemon listens on
+SOCKET_PATH = os.environ.get(
+    "IDOTMATRIX_SOCKET", os.path.join(tempfile.gettempdir(), "idotmatrix.sock")
+)
+# how long the client waits for the daemon to accept a connection
+CONNECT_TIMEOUT = 0.5
+
+def is_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class ClientLogHandler(logging.Handler):
+    """sends the log records of the running command back to the client which sent it"""
+
+    def __init__(self) -> None:
+        super().__init__(logging.INFO)
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.writer is None or self.writer.is_closing():
+            return
+        try:
+            message = {"log": self.format(record), "level": record.levelno}
+            self.writer.write((json.dumps(message) + "\n").encode("utf8"))
+        except Exception:
+            self.handleError(record)
+
+
+class DeviceDaemon:
+    """keeps the bluetooth connections open and runs app.py commands sent over a unix socket.
+    Every request is one JSON line with the arguments and working directory of the client,
+    commands run one after another and their log output is streamed back.
+    """
+
+    logging = logging.getLogger("idotmatrix." + __name__)
+
+    def __init__(self, cmd, parser, path: str = SOCKET_PATH, background_scan: bool = False) -> None:
+        self.cmd = cmd
+        self.parser = parser
+        self.path = path
+        self.background_scan = background_scan
+        self.lock = asyncio.Lock()
+        self.log_handler = ClientLogHandler()
+        self.log_handler.setFormatter(
+            logging.Formatter("%(asctime)s :: %(levelname)s :: %(name)s :: %(message)s", "%d.%m.%Y %H:%M:%S")
+        )
+
+    async def serve(self) -> None:
+        if os.path.exists(self.path):
+            if await is_running(self.path):
+                self.logging.error(f"a daemon is already listening on {self.path}")
+                return
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        os.chmod(self.path, 0o600)
+        logging.getLogger().addHandler(self.log_handler)
+        self.logging.info(f"daemon listening on {self.path}")
+        scanner = None
+        if self.background_scan:
+            # keeps the discovery cache fresh so --address auto connects without scanning
+            scanner = asyncio.ensure_future(self.cmd.discovery.watch(lock=self.lock))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if scanner is not None:
+                scanner.cancel()
+            logging.getLogger().removeHandler(self.log_handler)
+            await self.cmd.connections.disconnect_all()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        line = await reader.readline()
+        if not line:
+            # probes of is_running connect without sending anything
+            writer.close()
+            return
+        try:
+            request = json.loads(line)
+            code = await self.execute(request, writer)
+        except (ValueError, KeyError) as error:
+            self.logging.error(f"invalid request: {error}")
+            code = 2
+        try:
+            writer.write((json.dumps({"exit": code}) + "\n").encode("utf8"))
+            await writer.drain()
+            writer.close()
+        except ConnectionError:
+            pass
+
+    async def execute(self, request: dict, writer: asyncio.StreamWriter) -> int:
+        arguments = [str(argument) for argument in request["args"]]
+        async with self.lock:
+            started = time.perf_counter()
+            self.log_handler.writer = writer
+            cwd = os.getcwd()
+            try:
+                # relative file arguments are meant relative to the client
+                os.chdir(request.get("cwd") or cwd)
+                await self.cmd.run(self.parser.parse_args(arguments))
+                code = 0
+            except SystemExit as error:
+                # mirror the exit status app.py would have had
+                code = error.code if isinstance(error.code, int) else int(error.code is not None)
+            except Exception as error:
+                self.logging.error(f"command failed: {error}")
+                code = 1
+            finally:
+                os.chdir(cwd)
+                self.log_handler.writer = None
+            self.logging.debug(
+                f"{' '.join(arguments)} finished in {time.perf_counter() - started:.3f}s"
+            )
+        return code
+
+
+async def is_running(path: str = SOCKET_PATH) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_unix_connection(path), CONNECT_TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+async def send(arguments: List[str], path: str = SOCKET_PATH) -> Optional[int]:
+    """sends a command to the daemon and logs its output.
+    Returns the exit code of the command, or None if no daemon is running.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(path), CONNECT_TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    request = {"args": arguments, "cwd": os.getcwd()}
+    writer.write((json.dumps(request) + "\n").encode("utf8"))
+    await writer.drain()
+    code = 1
+    async for line in reader:
+        message = json.loads(line)
+        if "log" in message:
+            print(message["log"], file=sys.stderr, flush=True)
+        elif "exit" in message:
+            code = message["exit"]
+    writer.close()
+    return code
+
+
+def forward(arguments: List[str], path: str = SOCKET_PATH) -> Optional[int]:
+    """runs the command through a resident daemon if one is listening"""
+    if not is_supported() or not os.path.exists(path):
+        return None
+    return asyncio.run(send(arguments, path))
@@ -0,0 +1,144 @@
+# python imports
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+# state file shared by every app.py process on this machine
+STATE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "temp", "device_state.json"
+)
+# the device cannot be queried, so a remembered state is only trusted for this many seconds
+MAX_STATE_AGE = 600
+
+
+def content_hash(data: bytes, *options) -> str:
+    """returns a stable hash of uploaded content and the options used to process it"""
+    digest = hashlib.sha1(data)
+    for option in options:
+        digest.update(b"\0" + str(option).encode("utf8"))
+    return digest.hexdigest()
+
+
+def file_hash(file_path: str, *options) -> str:
+    """same as content_hash but reads the file in blocks, so large files never sit in memory"""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(65536), b""):
+            digest.update(block)
+    for option in options:
+        digest.update(b"\0" + str(option).encode("utf8"))
+    return digest.hexdigest()
+
+
+class DeviceState:
+    """last known state of a single device"""
+
+    FIELDS = ("mode", "brightness", "content_hash", "screen_on", "flipped")
+
+    def __init__(
+        self,
+        address: str,
+        mode: Optional[str] = None,
+        brightness: Optional[int] = None,
+        content_hash: Optional[str] = None,
+        screen_on: Optional[bool] = None,
+        flipped: Optional[bool] = None,
+        updated: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.address = address
+        self.mode = mode
+        self.brightness = brightness
+        self.content_hash = content_hash
+        self.screen_on = screen_on
+        self.flipped = flipped
+        # every field ages on its own, frequent uploads must not keep an old mode or brightness alive
+        self.updated = dict(updated or {})
+
+    def set(self, field: str, value) -> None:
+        setattr(self, field, value)
+        self.updated[field] = time.time()
+
+    def forget_stale(self, max_age: float) -> None:
+        now = time.time()
+        for field in self.FIELDS:
+            if now - self.updated.get(field, 0.0) > max_age:
+                setattr(self, field, None)
+                self.updated.pop(field, None)
+
+    def to_dict(self) -> dict:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data["updated"] = self.updated
+        return data
+
+    @classmethod
+    def from_dict(cls, address: str, data: dict) -> "DeviceState":
+        updated = data.get("updated")
+        if updated is None:
+            # files written before fields had their own time share one
+            updated = {field: data.get("updated_at", 0.0) for field in cls.FIELDS}
+        return cls(
+            address,
+            **{field: data.get(field) for field in cls.FIELDS},
+            updated=updated,
+        )
+
+
+class DeviceStateStore:
+    """remembers what was last sent to each device so redundant commands can be skipped"""
+
+    logging = logging.getLogger("idotmatrix." + __name__)
+
+    def __init__(self, path: str = STATE_PATH, max_age: float = MAX_STATE_AGE) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.states: Dict[str, DeviceState] = {}
+
+    def load(self) -> None:
+        """reads the state file, unknown or broken files start with an empty state"""
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            self.states = {
+                address: DeviceState.from_dict(address, values)
+                for address, values in data.items()
+            }
+        except FileNotFoundError:
+            self.states = {}
+        except (ValueError, AttributeError, TypeError) as error:
+            self.logging.warning(f"ignoring unreadable device state file: {error}")
+            self.states = {}
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as file:
+                json.dump(
+                    {address: state.to_dict() for address, state in self.states.items()},
+                    file,
+                )
+            os.replace(temp_path, self.path)
+        except OSError as error:
+            self.logging.warning(f"could not save device state: {error}")
+
+    def get(self, address: str) -> DeviceState:
+        """returns the known state of a device, fields which are unknown or too old are None"""
+        key = str(address).upper()
+        state = self.states.get(key)
+        if state is None:
+            state = DeviceState(key)
+            self.states[key] = state
+        state.forget_stale(self.max_age)
+        return state
+
+    def update(self, address: str, **changes) -> DeviceState:
+        state = self.get(address)
+        for field, value in changes.items():
+            state.set(field, value)
+        return state
+
+    def invalidate(self, address: str) -> None:
+        self.states.pop(str(address).upper(), None)
@@ -0,0 +1,152 @@
+# python imports
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import List, Optional
+
+# discovered devices shared by every app.py process on this machine
+DISCOVERY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "temp", "discovery.json"
+)
+# devices not seen for this many seconds are no longer tried by --address auto
+MAX_DEVICE_AGE = 7 * 24 * 60 * 60
+# seconds a direct connection to a cached device may take before the next one is tried
+CONNECT_TIMEOUT = 2.0
+# seconds of a full scan
+SCAN_TIMEOUT = 5.0
+# seconds between two scans of the background scanner
+SCAN_INTERVAL = 60.0
+
+
+class DiscoveredDevice:
+    """a device which was seen during a scan or connected to"""
+
+    def __init__(self, address: str, name: Optional[str] = None, rssi: Optional[int] = None, last_seen: float = 0.0) -> None:
+        self.address = address
+        self.name = name
+        self.rssi = rssi
+        self.last_seen = last_seen
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "rssi": self.rssi, "last_seen": self.last_seen}
+
+
+class DeviceDiscovery:
+    """remembers recently seen iDotMatrix devices so they can be connected without a full scan"""
+
+    logging = logging.getLogger("idotmatrix." + __name__)
+
+    def __init__(self, path: str = DISCOVERY_PATH, max_age: float = MAX_DEVICE_AGE) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.devices = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            self.devices = {
+                address: DiscoveredDevice(address, values.get("name"), values.get("rssi"), values.get("last_seen", 0.0))
+                for address, values in data.items()
+            }
+        except FileNotFoundError:
+            self.devices = {}
+        except (ValueError, AttributeError, TypeError) as error:
+            self.logging.warning(f"ignoring unreadable discovery cache: {error}")
+            self.devices = {}
+
+    def save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as file:
+                json.dump({address: device.to_dict() for address, device in self.devices.items()}, file)
+            os.replace(temp_path, self.path)
+        except OSError as error:
+            self.logging.warning(f"could not save discovery cache: {error}")
+
+    def record(self, address: str, name: Optional[str] = None, rssi: Optional[int] = None) -> DiscoveredDevice:
+        key = str(address).upper()
+        device = self.devices.get(key) or DiscoveredDevice(key)
+        device.name = name or device.name
+        device.rssi = rssi if rssi is not None else device.rssi
+        device.last_seen = time.time()
+        self.devices[key] = device
+        return device
+
+    def candidates(self) -> List[DiscoveredDevice]:
+        """returns the recently seen devices, most recently seen and strongest signal first"""
+        now = time.time()
+        recent = [device for device in self.devices.values() if now - device.last_seen <= self.max_age]
+        return sorted(recent, key=lambda device: (-device.last_seen, -(device.rssi or -999)))
+
+    async def scan(self, timeout: float = SCAN_TIMEOUT, quiet: bool = False) -> List[DiscoveredDevice]:
+        """scans for iDotMatrix devices and updates the cache, strongest signal first"""
+        from bleak import BleakScanner
+        from idotmatrix.const import BLUETOOTH_DEVICE_NAME
+
+        if not quiet:
+            self.logging.info("scanning for iDotMatrix bluetooth devices...")
+        self.load()
+        found = []
+        results = await BleakScanner.discover(timeout=timeout, return_adv=True)
+        for device, advertisement in results.values():
+            name = advertisement.local_name
+            if name and str(name).startswith(BLUETOOTH_DEVICE_NAME):
+                found.append(self.record(device.address, name, advertisement.rssi))
+        self.save()
+        found.sort(key=lambda device: -(device.rssi or -999))
+        if not quiet:
+            for device in found:
+                self.logging.info(f"found device {device.address} with name {device.name} (rssi {device.rssi})")
+        return found
+
+    async def connect_to(self, connections, address: str, timeout: float = CONNECT_TIMEOUT) -> bool:
+        """makes the device the active one of the connection pool and connects to it directly"""
+        from bleak import BleakClient
+
+        connections.activate(address)
+        conn = connections.conn
+        if conn.client is None:
+            conn.client = BleakClient(address, timeout=timeout)
+        try:
+            await asyncio.wait_for(conn.connect(), timeout + 1)
+            return True
+        except Exception as error:
+            self.logging.debug(f"could not connect to {address}: {error}")
+            conn.address = None
+            conn.client = None
+            return False
+
+    async def connect(self, connections) -> Optional[str]:
+        """connects to the first reachable device, cached devices are tried before scanning.
+        Returns the address of the connected device or None.
+        """
+        self.load()
+        for device in self.candidates():
+            self.logging.debug(f"trying cached device {device.address}")
+            if await self.connect_to(connections, device.address):
+                self.record(device.address)
+                self.save()
+                self.logging.info(f"connected to cached device {device.address}")
+                return device.address
+        for device in await self.scan():
+            if await self.connect_to(connections, device.address, SCAN_TIMEOUT):
+                return device.address
+        self.logging.error("no target devices found.")
+        return None
+
+    async def watch(self, interval: float = SCAN_INTERVAL, lock: Optional[asyncio.Lock] = None) -> None:
+        """keeps scanning in the background, waiting for the lock so no command is disturbed"""
+        while True:
+            try:
+                if lock is not None:
+                    async with lock:
+                        await self.scan(quiet=True)
+                else:
+                    await self.scan(quiet=True)
+            except Exception as error:
+                self.logging.warning(f"background scan failed: {error}")
+            await asyncio.sleep(interval)
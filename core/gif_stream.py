@@ -0,0 +1,146 @@
+# python imports
+import io
+import logging
+import math
+import random
+from typing import Iterator, List, Tuple, Union
+
+# pillow imports
+from PIL import Image as PilImage
+from PIL import ImageSequence
+
+# idotmatrix imports
+from idotmatrix import ConnectionManager
+from idotmatrix import Gif
+
+# largest animation the device reliably accepts in one upload
+MAX_GIF_SIZE = 64 * 1024
+# frame duration used when the source does not define one
+DEFAULT_DURATION = 100
+# number of frames the shared palette is built from
+PALETTE_SAMPLES = 64
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def decode_frames(file_path: str, pixel_size: int) -> List[Tuple[PilImage.Image, int]]:
+    """decodes every frame of a gif once into a small rgb image together with its duration.
+    The frames are device sized, so even long animations take little memory.
+    """
+    frames = []
+    with PilImage.open(file_path) as img:
+        for frame in ImageSequence.Iterator(img):
+            duration = frame.info.get("duration") or DEFAULT_DURATION
+            rgb = frame.convert("RGB")
+            if rgb.size != (pixel_size, pixel_size):
+                rgb = rgb.resize((pixel_size, pixel_size), PilImage.NEAREST)
+            frames.append((rgb, duration))
+    return frames
+
+
+def build_palette(frames: List[Tuple[PilImage.Image, int]], pixel_size: int, samples: int = PALETTE_SAMPLES) -> PilImage.Image:
+    """builds one palette for the whole animation from a random sample of its resized frames"""
+    images = [rgb for rgb, _ in frames]
+    if len(images) > samples:
+        images = random.Random(pixel_size).sample(images, samples)
+    mosaic = PilImage.new("RGB", (pixel_size, pixel_size * len(images)))
+    for index, rgb in enumerate(images):
+        mosaic.paste(rgb, (0, index * pixel_size))
+    return mosaic.quantize(colors=256)
+
+
+def quantize_frames(frames: List[Tuple[PilImage.Image, int]], palette: PilImage.Image) -> List[Tuple[PilImage.Image, bytes, int]]:
+    """maps every frame onto the shared palette, once for all strides tried later"""
+    quantized = []
+    for rgb, duration in frames:
+        small = rgb.quantize(palette=palette, dither=PilImage.Dither.NONE)
+        quantized.append((small, small.tobytes(), duration))
+    return quantized
+
+
+def iter_frames(frames: List[Tuple[PilImage.Image, bytes, int]], stride: int = 1) -> Iterator[PilImage.Image]:
+    """yields the frames to encode. Identical consecutive frames are merged into one
+    longer frame and only every stride-th frame is kept.
+    """
+    pending = None
+    pending_data = None
+    for index, (small, data, duration) in enumerate(frames):
+        if index % stride:
+            if pending is not None:
+                pending.info["duration"] += duration
+            continue
+        if data == pending_data:
+            pending.info["duration"] += duration
+            continue
+        if pending is not None:
+            yield pending
+        # a copy, the same quantized frames are encoded again with another stride
+        pending, pending_data = small.copy(), data
+        pending.info = {"duration": duration}
+    if pending is not None:
+        yield pending
+
+
+def encode(frames: Iterator[PilImage.Image]) -> Tuple[bytes, int]:
+    """encodes frames into a gif while they are produced, returns the data and the frame count"""
+    counter = {"frames": 0}
+
+    def counted(iterator):
+        for frame in iterator:
+            counter["frames"] += 1
+            yield frame
+
+    frames = counted(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("gif does not contain any frames")
+    buffer = io.BytesIO()
+    first.save(
+        buffer,
+        format="GIF",
+        save_all=True,
+        append_images=frames,
+        loop=1,
+        disposal=2,
+    )
+    return buffer.getvalue(), counter["frames"]
+
+
+def process_gif(file_path: str, pixel_size: int, max_size: int = MAX_GIF_SIZE) -> bytes:
+    """processes a gif of any size into one which fits into the device buffer.
+    The source is decoded once, frames are dropped (keeping the overall timing) until the result is small enough.
+    """
+    decoded = decode_frames(file_path, pixel_size)
+    frames = quantize_frames(decoded, build_palette(decoded, pixel_size))
+    # the rgb frames are not needed any more once every frame is quantized
+    del decoded
+    stride = 1
+    while True:
+        data, frame_count = encode(iter_frames(frames, stride))
+        if len(data) <= max_size or frame_count <= 1:
+            break
+        # the size shrinks about with the kept frames, so the stride is guessed from it instead of doubled blindly
+        next_stride = max(stride + 1, math.ceil(stride * len(data) / max_size))
+        logger.info(
+            f"gif with {frame_count} frames has {len(data)} bytes, keeping every {next_stride}. frame"
+        )
+        stride = next_stride
+    if len(data) > max_size:
+        logger.warning(f"gif is still {len(data)} bytes, the device might reject it")
+    logger.debug(f"processed gif to {len(data)} bytes with {frame_count} frames")
+    return data
+
+
+async def upload(gif_data: bytes) -> Union[bool, List[bytearray]]:
+    """uploads already processed gif data to the device"""
+    try:
+        # the chunk header carries the total length and crc, so chunks are built from the finished gif
+        chunks = Gif()._createPayloads(gif_data)
+        conn = ConnectionManager()
+        await conn.connect()
+        for chunk in chunks:
+            await conn.send(data=chunk, response=True)
+        return chunks
+    except Exception as error:
+        logger.error(f"could not upload gif: {error}")
+        return False
@@ -0,0 +1,36 @@
+# python imports
+import io
+import logging
+from typing import Union
+
+# pillow imports
+from PIL import Image as PilImage
+
+# idotmatrix imports
+from idotmatrix import ConnectionManager
+from idotmatrix import Image
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def process_image(file_path: str, pixel_size: int) -> bytes:
+    """resizes an image to the device size and encodes it as png"""
+    with PilImage.open(file_path) as img:
+        if img.size != (pixel_size, pixel_size):
+            img = img.resize((pixel_size, pixel_size), PilImage.LANCZOS)
+        png_buffer = io.BytesIO()
+        img.save(png_buffer, format="PNG")
+        return png_buffer.getvalue()
+
+
+async def upload(png_data: bytes) -> Union[bool, bytearray]:
+    """uploads already encoded png data to the device"""
+    try:
+        data = Image()._createPayloads(png_data)
+        conn = ConnectionManager()
+        await conn.connect()
+        await conn.send(data=data)
+        return data
+    except Exception as error:
+        logger.error(f"could not upload image: {error}")
+        return False
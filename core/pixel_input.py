@@ -0,0 +1,68 @@
+# python imports
+import logging
+import os
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# third party imports
+import numpy as np
+
+RAW_FORMATS = {"rgb": 3, "rgba": 4}
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def split_channels(frame: np.ndarray, size: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """checks a whole frame against the device size at once and returns its rgb view and alpha mask"""
+    if frame.ndim != 3 or frame.shape[:2] != (size, size) or frame.shape[2] not in (3, 4):
+        raise ValueError(f"expected a {size}x{size} frame with 3 or 4 channels, got shape {frame.shape}")
+    if frame.dtype != np.uint8:
+        if not np.issubdtype(frame.dtype, np.integer) or frame.min() < 0 or frame.max() > 255:
+            raise ValueError(f"pixel values must be integers between 0 and 255, got {frame.dtype}")
+        frame = frame.astype(np.uint8)
+    # both are views into the frame, nothing is copied
+    return frame[..., :3], (frame[..., 3] > 0 if frame.shape[2] == 4 else None)
+
+
+def raw_format(path: str, pixel_format: Optional[str]) -> int:
+    if pixel_format is None:
+        pixel_format = "rgba" if path.lower().endswith(".rgba") else "rgb"
+    return RAW_FORMATS[pixel_format]
+
+
+def load_frame(path: str, size: int, pixel_format: Optional[str] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """reads a frame from a .npy array, a png or a raw rgb/rgba buffer"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        # memory mapped, the array is only read as far as it is used
+        return split_channels(np.load(path, mmap_mode="r"), size)
+    if extension == ".png":
+        from PIL import Image
+
+        with Image.open(path) as image:
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+            return split_channels(np.asarray(image.convert("RGBA" if has_alpha else "RGB")), size)
+    channels = raw_format(path, pixel_format)
+    expected = size * size * channels
+    if os.path.getsize(path) != expected:
+        raise ValueError(f"{path} has {os.path.getsize(path)} bytes, a {size}x{size} frame needs {expected}")
+    return split_channels(np.memmap(path, dtype=np.uint8, mode="r").reshape(size, size, channels), size)
+
+
+def read_frames(stream: BinaryIO, size: int, pixel_format: Optional[str] = None) -> Iterator[Tuple[np.ndarray, Optional[np.ndarray]]]:
+    """yields raw frames from a stream until it ends.
+    Every frame is read into the same buffer, so a frame is only valid until the next one is requested.
+    """
+    channels = RAW_FORMATS[pixel_format or "rgb"]
+    buffer = bytearray(size * size * channels)
+    view = memoryview(buffer)
+    frame = np.frombuffer(buffer, dtype=np.uint8).reshape(size, size, channels)
+    while True:
+        filled = 0
+        while filled < len(buffer):
+            read = stream.readinto(view[filled:])
+            if not read:
+                if filled:
+                    logger.warning(f"dropping an incomplete frame of {filled} bytes at the end of the input")
+                return
+            filled += read
+        yield split_channels(frame, size)
@@ -0,0 +1,77 @@
+# python imports
+import io
+import math
+from typing import List, Optional, Tuple
+
+# third party imports
+import numpy as np
+from PIL import Image
+
+# sizes of the commands of the idotmatrix library
+PIXEL_COMMAND_SIZE = 10
+MODE_COMMAND_SIZE = 5
+IMAGE_CHUNK_SIZE = 4096
+IMAGE_CHUNK_HEADER_SIZE = 9
+# bluez usually negotiates an mtu of 185, 3 bytes of it are the att header
+ATT_PAYLOAD_SIZE = 182
+# l2cap and att header of every packet on air
+PACKET_OVERHEAD = 7
+# the ConnectionManager pauses 10 ms after each write, about as long as sending this many bytes
+WRITE_PAUSE_COST = 80
+# the pixel editor shows unpainted cells as white, on the device they stay dark
+EMPTY_COLOR = (255, 255, 255)
+
+
+def write_cost(size: int) -> int:
+    """estimated bytes on air for one write of the given size"""
+    return size + math.ceil(size / ATT_PAYLOAD_SIZE) * PACKET_OVERHEAD + WRITE_PAUSE_COST
+
+
+def pixel_upload_cost(count: int) -> int:
+    return count * write_cost(PIXEL_COMMAND_SIZE)
+
+
+def image_upload_cost(png_size: int) -> int:
+    payload_size = png_size + math.ceil(png_size / IMAGE_CHUNK_SIZE) * IMAGE_CHUNK_HEADER_SIZE
+    return write_cost(MODE_COMMAND_SIZE) + write_cost(payload_size)
+
+
+def painted_mask(pixels: np.ndarray) -> np.ndarray:
+    return np.any(pixels != EMPTY_COLOR, axis=2)
+
+
+def encode_frame(pixels: np.ndarray, mask: Optional[np.ndarray] = None) -> bytes:
+    """png of the whole frame with the unpainted cells turned off"""
+    if mask is None:
+        mask = painted_mask(pixels)
+    frame = np.zeros(pixels.shape, dtype=np.uint8)
+    frame[mask] = pixels[mask]
+    buffer = io.BytesIO()
+    Image.fromarray(frame, mode="RGB").save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def painted_pixels(pixels: np.ndarray, mask: Optional[np.ndarray] = None) -> List[Tuple[int, int, int, int, int]]:
+    """x, y, r, g, b of every painted cell"""
+    rows, cols = np.nonzero(painted_mask(pixels) if mask is None else mask)
+    colors = pixels[rows, cols].tolist()
+    return [(x, y, r, g, b) for x, y, (r, g, b) in zip(cols.tolist(), rows.tolist(), colors)]
+
+
+def plan_upload(pixels: np.ndarray, mask: Optional[np.ndarray] = None, frame_mask: Optional[np.ndarray] = None):
+    """picks the upload which sends fewer bytes: ("pixels", painted cells) or ("image", png data).
+    mask selects the cells to send one by one, by default every cell which is not EMPTY_COLOR.
+    frame_mask selects the cells shown by the image (default: mask), the others are turned off
+    """
+    if mask is None:
+        mask = painted_mask(pixels)
+    if frame_mask is None:
+        frame_mask = mask
+    painted = painted_pixels(pixels, mask)
+    # no image is cheaper than a single pixel write, so at most one pixel is sent without encoding the png
+    if pixel_upload_cost(len(painted)) <= image_upload_cost(0):
+        return "pixels", painted
+    png_data = encode_frame(pixels, frame_mask)
+    if pixel_upload_cost(len(painted)) <= image_upload_cost(len(png_data)):
+        return "pixels", painted
+    return "image", png_data
@@ -1,21 +1,53 @@
-import requests
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageSequence
+from PIL import ImageSequence
 import imageio
-import numpy
 
 
 
-from utils.utils import digits,patterns, colors, api_key
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QStackedWidget,
     QPlainTextEdit, QHBoxLayout, QMessageBox, QListWidgetItem, QGridLayout,
     QDialog, QLineEdit, QListWidget, QInputDialog, QCheckBox, QDialogButtonBox,
-    QComboBox, QColorDialog, QSlider, QMenu, QFileDialog
+    QComboBox, QColorDialog, QSlider, QMenu, QFileDialog, QShortcut
 )
-from PyQt5.QtGui import QFont, QIcon, QColor
-from PyQt5.QtCore import Qt, QProcess, QSettings, pyqtSignal
-import sys, re, copy
+from PyQt5.QtGui import QFont, QIcon, QColor, QImage, QKeySequence, QPainter, QPixmap
+from PyQt5.QtCore import Qt, QObject, QRect, QSettings, QTimer, pyqtSignal
+import sys, re, collections, logging, os
+import numpy as np
+from core.command_queue import SCREEN_FLAGS, DeviceCommandQueue
+from core.discovery import DeviceDiscovery
+from core import upload_planner
+from utils import weather
+from utils.weather import WeatherService
+from utils.favorites import FavoritesLibrary
+
+# --- Device Command Queue ---
+class DeviceCommandBridge(QObject):
+    # mac address, event, message
+    command_event = pyqtSignal(str, str, str)
+    SCAN = "scan"
+    _shared = None
+
+    def __init__(self):
+        super().__init__()
+        # The queue calls the listener from its worker thread, Qt delivers the signal on the UI thread.
+        self.queue = DeviceCommandQueue(listener=self.command_event.emit)
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def submit(self, args):
+        mac_address = args[args.index("--address") + 1]
+        self.queue.submit(mac_address, args)
+
+    def scan(self):
+        # scans run on their own worker, the shared bluetooth lock keeps them apart from device commands
+        self.queue.submit(self.SCAN, ["--scan"])
+
+weather_service = WeatherService()
 
 # --- Dialog Classes ---
 class ClockStyleDialog(QDialog):
@@ -240,16 +272,204 @@ class ColorControlDialog(QDialog):
             self.accepted.emit(self.selected_color.name(), self.is_pixel_paint)
         super().accept()
 
+def pack_rgb(pixels):
+    pixels = pixels.astype(np.uint32)
+    return (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+
+def unpack_rgb(packed):
+    return np.stack(((packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF), axis=-1).astype(np.uint8)
+
+
+class PixelHistory:
+    """undo and redo of pixel edits, every edit keeps only the changed pixel indices with their old and new color"""
+
+    def __init__(self, max_bytes=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.undo_stack = collections.deque()
+        self.redo_stack = []
+        self.size = 0
+
+    @staticmethod
+    def entry_size(entry):
+        return sum(array.nbytes for array in entry)
+
+    def push(self, indices, old, new):
+        if not len(indices):
+            return
+        for entry in self.redo_stack:
+            self.size -= self.entry_size(entry)
+        self.redo_stack = []
+        entry = (indices, old, new)
+        self.undo_stack.append(entry)
+        self.size += self.entry_size(entry)
+        # The oldest edits are forgotten first, the last one always stays undoable.
+        while self.size > self.max_bytes and len(self.undo_stack) > 1:
+            self.size -= self.entry_size(self.undo_stack.popleft())
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry[0], entry[1]
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry[0], entry[2]
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.size = 0
+
+
+class PixelCanvas(QWidget):
+    # emitted when the mouse is released, take_stroke() returns what changed
+    stroke_finished = pyqtSignal()
+    EMPTY = (255, 255, 255)
+
+    def __init__(self, grid_size=32, cell_size=20, parent=None):
+        super().__init__(parent)
+        self.color = (0, 0, 0)
+        self.last_cell = None
+        # flat index -> packed color before the current stroke touched it
+        self.stroke = {}
+        self.resize_grid(grid_size, cell_size)
+
+    def resize_grid(self, grid_size, cell_size):
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.pixels = np.full((grid_size, grid_size, 3), 255, dtype=np.uint8)
+        self.stroke = {}
+        # The image shares the array's memory, so pixels must only ever be changed in place.
+        self.image = QImage(self.pixels.data, grid_size, grid_size, grid_size * 3, QImage.Format_RGB888)
+        self.setFixedSize(grid_size * cell_size, grid_size * cell_size)
+        self.update()
+
+    def cell_rect(self, row, col):
+        return QRect(col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size)
+
+    def cell_at(self, pos):
+        row, col = pos.y() // self.cell_size, pos.x() // self.cell_size
+        if 0 <= row < self.grid_size and 0 <= col < self.grid_size:
+            return row, col
+        return None
+
+    def set_pixel(self, row, col, color):
+        self.pixels[row, col] = color
+        self.update(self.cell_rect(row, col))
+
+    def set_pixels(self, pixels):
+        self.pixels[:] = pixels
+        self.update()
+
+    def clear(self):
+        self.set_pixels(self.EMPTY)
+
+    def apply(self, indices, packed):
+        if not len(indices):
+            return
+        self.pixels.reshape(-1, 3)[indices] = unpack_rgb(packed)
+        rows, cols = np.divmod(indices, self.grid_size)
+        top_left = self.cell_rect(int(rows.min()), int(cols.min()))
+        self.update(top_left.united(self.cell_rect(int(rows.max()), int(cols.max()))))
+
+    def diff(self, pixels):
+        """indices, old and new packed colors of the pixels that differ from the given ones"""
+        old, new = pack_rgb(self.pixels).ravel(), pack_rgb(pixels).ravel()
+        indices = np.flatnonzero(old != new).astype(np.int32)
+        return indices, old[indices], new[indices]
+
+    def take_stroke(self):
+        indices = np.fromiter(self.stroke.keys(), dtype=np.int32, count=len(self.stroke))
+        old = np.fromiter(self.stroke.values(), dtype=np.uint32, count=len(self.stroke))
+        self.stroke = {}
+        new = pack_rgb(self.pixels.reshape(-1, 3)[indices])
+        # Cells painted over with their original color are no change at all.
+        changed = old != new
+        return indices[changed], old[changed], new[changed]
+
+    def paint(self, row, col):
+        if tuple(self.pixels[row, col]) == self.color:
+            return
+        index = row * self.grid_size + col
+        if index not in self.stroke:
+            self.stroke[index] = int(pack_rgb(self.pixels[row, col]))
+        self.set_pixel(row, col, self.color)
+
+    def paint_line(self, start, end):
+        # Fast mouse moves skip cells, the gap to the previous cell is filled with a straight line.
+        (row, col), (end_row, end_col) = start, end
+        d_row, d_col = abs(end_row - row), -abs(end_col - col)
+        step_row, step_col = (1 if end_row > row else -1), (1 if end_col > col else -1)
+        error = d_row + d_col
+        while True:
+            self.paint(row, col)
+            if (row, col) == (end_row, end_col):
+                return
+            if 2 * error >= d_col:
+                error += d_col
+                row += step_row
+            if 2 * error <= d_row:
+                error += d_row
+                col += step_col
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        size = self.cell_size
+        area = event.rect()
+        # Only the cells inside the damaged rectangle are drawn again.
+        first_row, first_col = max(0, area.top() // size), max(0, area.left() // size)
+        last_row = min(self.grid_size - 1, area.bottom() // size)
+        last_col = min(self.grid_size - 1, area.right() // size)
+        source = QRect(first_col, first_row, last_col - first_col + 1, last_row - first_row + 1)
+        target = QRect(first_col * size, first_row * size, source.width() * size, source.height() * size)
+        painter.drawImage(target, self.image, source)
+        painter.setPen(QColor(0, 0, 0, 80))
+        for col in range(first_col, last_col + 2):
+            painter.drawLine(col * size, target.top(), col * size, target.bottom())
+        for row in range(first_row, last_row + 2):
+            painter.drawLine(target.left(), row * size, target.right(), row * size)
+        painter.end()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.last_cell = self.cell_at(event.pos())
+            if self.last_cell:
+                self.paint(*self.last_cell)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            cell = self.cell_at(event.pos())
+            if cell is None:
+                return
+            self.paint_line(self.last_cell or cell, cell)
+            self.last_cell = cell
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.last_cell = None
+            self.stroke_finished.emit()
+
+
 class PixelPaintDialog(QDialog):
     
     FAVORITES_KEY = "PixelPaintFavorites"
+    GRID_SIZES = (16, 32, 64)
+    CANVAS_SIZE = 640
+    HISTORY_LIMIT = 4 * 1024 * 1024
+    FRAME_PATH = os.path.join("temp", "pixel_paint.png")
     
-    def __init__(self, mac_address):
+    def __init__(self, mac_address, history_limit=HISTORY_LIMIT):
         super().__init__()
         self.mac_address = mac_address
+        self.history = PixelHistory(history_limit)
+        self.favorites = FavoritesLibrary()
         self.init_ui()
         self.load_favorites()
-        self.finished.connect(self.save_favorites)
 
     def init_ui(self):
         self.setWindowTitle('Pixel Paint')
@@ -257,10 +477,6 @@ class PixelPaintDialog(QDialog):
 
         self.current_color = QColor(0, 0, 0)
         self.grid_size = 32
-        self.cell_size = 20
-        self.grid = [[QColor(255, 255, 255) for _ in range(self.grid_size)] for _ in range(self.grid_size)]
-        self.undo_stack = []
-        self.current_stroke = []
         self.setWindowIcon(QIcon('gui/idmc.ico'))
 
         layout = QVBoxLayout()
@@ -295,6 +511,13 @@ class PixelPaintDialog(QDialog):
         color_picker_button = QPushButton('Pick Color')
         color_picker_button.clicked.connect(self.pick_color)
         toolbar_layout.addWidget(color_picker_button)
+
+        self.size_combo = QComboBox()
+        for size in self.GRID_SIZES:
+            self.size_combo.addItem(f"{size}x{size}", size)
+        self.size_combo.setCurrentIndex(self.GRID_SIZES.index(self.grid_size))
+        self.size_combo.currentIndexChanged.connect(lambda index: self.set_grid_size(self.size_combo.itemData(index)))
+        toolbar_layout.addWidget(self.size_combo)
         
         layout.addLayout(toolbar_layout)
 
@@ -319,26 +542,22 @@ class PixelPaintDialog(QDialog):
         undo_button = QPushButton('Undo')
         undo_button.clicked.connect(self.undo)
         button_layout.addWidget(undo_button)
+
+        redo_button = QPushButton('Redo')
+        redo_button.clicked.connect(self.redo)
+        button_layout.addWidget(redo_button)
+
+        QShortcut(QKeySequence.Undo, self, activated=self.undo)
+        QShortcut(QKeySequence.Redo, self, activated=self.redo)
         
         layout.addLayout(button_layout)
 
-        self.grid_widget = QGridLayout()
-        self.grid_widget.setSpacing(0)
-        self.grid_labels = []
-        for row in range(self.grid_size):
-            row_labels = []
-            for col in range(self.grid_size):
-                label = QLabel()
-                label.setFixedSize(self.cell_size, self.cell_size)
-                label.setStyleSheet("border: 1px solid black; background-color: white;")
-                label.mousePressEvent = lambda event, r=row, c=col: self.paint_cell(r, c)
-                label.mouseMoveEvent = self.mouse_move_event
-                self.grid_widget.addWidget(label, row, col)
-                row_labels.append(label)
-            self.grid_labels.append(row_labels)
+        self.canvas = PixelCanvas(self.grid_size, self.CANVAS_SIZE // self.grid_size)
+        self.canvas.color = (self.current_color.red(), self.current_color.green(), self.current_color.blue())
+        self.canvas.stroke_finished.connect(lambda: self.history.push(*self.canvas.take_stroke()))
 
         grid_container = QVBoxLayout()
-        grid_container.addLayout(self.grid_widget)
+        grid_container.addWidget(self.canvas)
 
         layout_with_favorites = QHBoxLayout()
         layout_with_favorites.addWidget(self.favorites_list)
@@ -365,6 +584,7 @@ class PixelPaintDialog(QDialog):
     
     def set_current_color(self, color):
         self.current_color = color
+        self.canvas.color = (color.red(), color.green(), color.blue())
         for button in self.color_buttons:
             if button.property('color_data') == (color.red(), color.green(), color.blue()):
                 button.setStyleSheet(f"background-color: rgb{color.red(), color.green(), color.blue()}; border: 2px solid gray;")
@@ -379,93 +599,80 @@ class PixelPaintDialog(QDialog):
     def erase_cell(self):
         self.set_current_color(QColor(255, 255, 255))
 
-    def paint_cell(self, row, col):
-        if not self.current_stroke:
-            self.undo_stack.append([])
-        self.current_stroke.append((row, col))
-        self.grid[row][col] = self.current_color
-        self.update_cell_style(row, col)
-    
-    def mouse_move_event(self, event):
-        if event.buttons() & Qt.LeftButton:
-            pos_in_dialog = self.mapFromGlobal(event.globalPos())
-            for row in range(self.grid_size):
-                for col in range(self.grid_size):
-                    if self.grid_labels[row][col].geometry().contains(pos_in_dialog):
-                        self.paint_cell(row, col)
-                        return
-
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            pos_in_dialog = self.mapFromGlobal(event.globalPos())
-            for row in range(self.grid_size):
-                for col in range(self.grid_size):
-                    if self.grid_labels[row][col].geometry().contains(pos_in_dialog):
-                        self.paint_cell(row, col)
-                        return
-    
-    def mouseReleaseEvent(self, event):
-        if self.current_stroke:
-            self.undo_stack[-1].extend(self.current_stroke)
-            self.current_stroke = []
+    def set_grid_size(self, size):
+        if size == self.grid_size:
+            return
+        self.grid_size = size
+        self.canvas.resize_grid(size, self.CANVAS_SIZE // size)
+        self.history.clear()
+
+    def replace_pixels(self, pixels):
+        # Whole grid changes are stored like a stroke, only with the pixels that really differ.
+        self.history.push(*self.canvas.diff(pixels))
+        self.canvas.set_pixels(pixels)
     
     def save_grid(self):
         name, ok = QInputDialog.getText(self, 'Save Grid', 'Enter a name for this favorite:')
         if ok and name:
-            self.favorites_list.addItem(name)
-            settings = QSettings("MyCompany", self.FAVORITES_KEY)
-            settings.setValue(name, self.grid)
-            self.save_favorites()
+            replaced = name in self.favorites.entries
+            self.favorites.save(name, self.canvas.pixels)
+            if replaced:
+                self.favorites_list.findItems(name, Qt.MatchExactly)[0].setIcon(self.favorite_icon(name))
+            else:
+                self.add_favorite_item(name)
+
+    def grid_from_setting(self, value):
+        # Older favorites were saved as a grid of QColor objects.
+        if isinstance(value, list):
+            return np.array([[(color.red(), color.green(), color.blue()) for color in row] for row in value], dtype=np.uint8)
+        data = np.frombuffer(bytes(value), dtype=np.uint8)
+        size = int(round((data.size // 3) ** 0.5))
+        return data.reshape(size, size, 3)
 
     def load_grid(self):
         current_item = self.favorites_list.currentItem()
         if current_item:
             name = current_item.text()
-            settings = QSettings("MyCompany", self.FAVORITES_KEY)
-            loaded_grid = settings.value(name)
-            if loaded_grid:
-                self.grid = loaded_grid
-                for row in range(self.grid_size):
-                    for col in range(self.grid_size):
-                        self.update_cell_style(row, col)
+            # Drawings are only read from disk once they are picked.
+            pixels = self.favorites.load(name)
+            if pixels is not None:
+                self.size_combo.setCurrentIndex(self.GRID_SIZES.index(pixels.shape[0]))
+                self.replace_pixels(pixels)
             else:
                 QMessageBox.warning(self, 'Load Grid', f'Grid "{name}" not found.')
     
     def clear_grid(self):
-        self.undo_stack.append(copy.deepcopy(self.grid))
-        for row in range(self.grid_size):
-            for col in range(self.grid_size):
-                self.grid[row][col] = QColor(255, 255, 255)
-                self.update_cell_style(row, col)
-        self.undo_stack[-1].append(None)
+        self.replace_pixels(np.full_like(self.canvas.pixels, 255))
     
     def undo(self):
-        if self.undo_stack:
-            stroke_to_undo = self.undo_stack.pop()
-            if stroke_to_undo and stroke_to_undo[-1] is None:
-                stroke_to_undo.pop()
-                self.grid = copy.deepcopy(stroke_to_undo)
-                for row in range(self.grid_size):
-                    for col in range(self.grid_size):
-                        self.update_cell_style(row, col)
-            else:
-                for row, col in stroke_to_undo:
-                    self.grid[row][col] = QColor(255, 255, 255)
-                    self.update_cell_style(row, col)
+        change = self.history.undo()
+        if change:
+            self.canvas.apply(*change)
+
+    def redo(self):
+        change = self.history.redo()
+        if change:
+            self.canvas.apply(*change)
     
     def send_grid(self):
-        commands = []
-        for row in range(self.grid_size):
-            for col in range(self.grid_size):
-                color = self.grid[row][col]
-                if color != QColor(255, 255, 255):
-                    command = f"{col}-{row}-{color.red()}-{color.green()}-{color.blue()}"
-                    commands.append(command)
-        if commands:
-            self.send_command_to_device(commands)
+        # Sent one by one or as one image upload, whatever sends fewer bytes; that is one by one for a single pixel or two.
+        upload, data = upload_planner.plan_upload(self.canvas.pixels)
+        if upload == "image":
+            self.send_frame_to_device(data)
+        elif data:
+            self.send_command_to_device([f"{x}-{y}-{r}-{g}-{b}" for x, y, r, g, b in data])
         else:
             QMessageBox.warning(self, 'Send Grid', 'No pixels to send.')
 
+    def send_frame_to_device(self, png_data):
+        os.makedirs("temp", exist_ok=True)
+        # Replaced in one step, a queued upload never reads a half written file.
+        with open(self.FRAME_PATH + ".tmp", "wb") as file:
+            file.write(png_data)
+        os.replace(self.FRAME_PATH + ".tmp", self.FRAME_PATH)
+        self.run_command(["--address", self.mac_address, "--image", "true",
+                          "--set-image", self.FRAME_PATH, "--process-image", str(self.grid_size)])
+
     def send_command_to_device(self, commands):
         command_array = ["--address", self.mac_address]
         for command in commands:
@@ -473,52 +680,78 @@ class PixelPaintDialog(QDialog):
         self.run_command(command_array)
         
     def send_clear_command_to_device(self, commands):
-        command_array = ["--address", self.mac_address]
+        command_array = ["--address", self.mac_address] + commands
         self.run_command(command_array)
 
     def run_command(self, command_array):
-        process = QProcess(self)
-        process.start("cmd.exe", ["/c", "python", "app.py"] + command_array)
-        process.waitForFinished()
+        DeviceCommandBridge.shared().submit(command_array)
 
     def clear_device(self):
         rgb_str = "0-0-0"
         self.send_clear_command_to_device(["--fullscreen-color", rgb_str.replace('#', '')])
-
-    def update_cell_style(self, row, col):
-        color = self.grid[row][col]
-        border_style = "border: 1px solid black;" if color == QColor(255, 255, 255) else ""
-        self.grid_labels[row][col].setStyleSheet(f"background-color: {color.name()}; {border_style}")
     
     def load_favorites(self):
+        self.migrate_favorites()
+        for name in self.favorites.names():
+            self.add_favorite_item(name)
+
+    def migrate_favorites(self):
+        # Favorites used to live in QSettings, they are moved into the library once.
         settings = QSettings("MyCompany", self.FAVORITES_KEY)
-        favorite_names = settings.value("favoriteNames", [])
+        # type=list, a single name is read back as a plain string otherwise
+        favorite_names = settings.value("favoriteNames", [], type=list)
+        failed = []
         for name in favorite_names:
-            self.favorites_list.addItem(name)
+            value = settings.value(name)
+            if value and name not in self.favorites.entries:
+                try:
+                    self.favorites.save(name, self.grid_from_setting(value))
+                except (ValueError, TypeError) as e:
+                    logging.warning(f"Could not migrate favorite {name}: {e}")
+                    failed.append(name)
+                    continue
+            settings.remove(name)
+        if failed:
+            settings.setValue("favoriteNames", failed)
+        else:
+            settings.remove("favoriteNames")
 
-    def save_favorites(self):
-        settings = QSettings("MyCompany", self.FAVORITES_KEY)
-        favorite_names = [self.favorites_list.item(i).text() for i in range(self.favorites_list.count())]
-        settings.setValue("favoriteNames", favorite_names)
+    def favorite_icon(self, name):
+        pixmap = QPixmap()
+        pixmap.loadFromData(self.favorites.thumbnail(name), "PNG")
+        return QIcon(pixmap)
+
+    def add_favorite_item(self, name):
+        self.favorites_list.addItem(QListWidgetItem(self.favorite_icon(name), name))
+
+    def send_favorite(self, item):
+        name = item.text()
+        size = self.favorites.entries[name]["size"]
+        device_path = self.favorites.device_path(name)
+        if device_path is None:
+            QMessageBox.warning(self, 'Send to Device', f'Grid "{name}" not found.')
+            return
+        self.run_command(["--address", self.mac_address, "--image", "true",
+                          "--set-image", device_path, "--process-image", str(size)])
         
     def show_favorites_context_menu(self, pos):
         item = self.favorites_list.itemAt(pos)
         if item:
             menu = QMenu(self)
             load_action = menu.addAction("Load")
+            send_action = menu.addAction("Send to Device")
             delete_action = menu.addAction("Delete")
             action = menu.exec_(self.favorites_list.mapToGlobal(pos))
             if action == load_action:
                 self.load_grid()
+            elif action == send_action:
+                self.send_favorite(item)
             elif action == delete_action:
                 self.delete_favorite(item)
 
     def delete_favorite(self, item):
-        name = item.text()
-        settings = QSettings("MyCompany", self.FAVORITES_KEY)
-        settings.remove(name)
+        self.favorites.delete(item.text())
         self.favorites_list.takeItem(self.favorites_list.row(item))
-        self.save_favorites()
 
 class ScoreboardDialog(QDialog):
     def __init__(self, device_page):
@@ -583,6 +816,8 @@ class ScoreboardDialog(QDialog):
         
 # --- Main App Classes ---
 class DevicePage(QWidget):
+    # kind, data, error of a weather request
+    weather_received = pyqtSignal(str, object, object)
    
     # --- UI  Setup ---
     def __init__(self, main_window, friendly_name, device_name, mac_address):
@@ -591,12 +826,16 @@ class DevicePage(QWidget):
         self.friendly_name = friendly_name
         self.device_name = device_name
         self.mac_address = mac_address
-        self.first_output_received = False
-        self.last_command = None
         self.clock_styles = ['Default', 'Christmas', 'Racing', 'Inverted Full Screen',
                              'Animated Hourglass', 'Frame 1', 'Frame 2', 'Frame 3']
         self.init_ui()
         self.flip_screen_state = False
+        DeviceCommandBridge.shared().command_event.connect(self.handle_command_event)
+        self.weather_request = None
+        self.weather_command = None
+        self.weather_timer = QTimer(self)
+        self.weather_timer.timeout.connect(self.request_weather)
+        self.weather_received.connect(self.handle_weather)
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -637,6 +876,7 @@ class DevicePage(QWidget):
             ("Set GIF", self.set_gif),
             ("Set Weather", self.set_weather),
             ("Set Weather GIF", self.set_weather_gif),
+            ("Stop Weather", self.stop_weather),
 
             
         ]
@@ -666,39 +906,21 @@ class DevicePage(QWidget):
         self.main_window.stacked_widget.setCurrentWidget(self.main_window.homepage)
 
     def run_command(self, args):
-            self.console_output.clear()
-            self.process = QProcess(self)
-            self.process.setProcessChannelMode(QProcess.MergedChannels)
-            self.process.readyRead.connect(self.handle_ready_read)
-            self.process.finished.connect(self.process_finished)
-            self.process.start("cmd.exe", ["/c", "python", "app.py"] + args)
-
-    def handle_ready_read(self):
-        data = self.process.readAll()
-        stdout = bytes(data).decode("utf8").strip()
-       
-        current_command = self.process.arguments()[2:]
-        output_lines = stdout.splitlines()
-       
-        if output_lines:
-            first_line = output_lines[0]
-            rest_of_output = '\n'.join(output_lines[1:])
-           
-            if self.last_command != current_command:
-                self.console_output.appendPlainText(f"Command: {' '.join(current_command)}\n")
-                self.last_command = current_command
-           
-            self.console_output.appendPlainText(f"Output: {first_line}\n")
-           
-            if rest_of_output:
-                self.console_output.appendPlainText(rest_of_output + '\n')
+        DeviceCommandBridge.shared().submit(args)
+
+    def handle_command_event(self, mac_address, event, message):
+        if mac_address != self.mac_address:
+            return
+        if event == "log":
+            self.console_output.appendPlainText(message)
+        elif event == "queued":
+            self.console_output.appendPlainText(f"Command: {message}")
+            # Anything else sent to the screen, from this page or the pixel editor, ends the weather updates.
+            if self.weather_request and message != self.weather_command and self.replaces_screen(message):
+                self.stop_weather()
+                self.console_output.appendPlainText("Weather updates stopped.")
         else:
-            self.console_output.appendPlainText(f"Command: {' '.join(current_command)}\nOutput:\n")
-       
-        self.last_command = current_command
-   
-    def process_finished(self):
-        pass
+            self.console_output.appendPlainText(f"{event.capitalize()}: {message}\n")
    
     def hex_to_rgb(self, hex_color):
         hex_color = hex_color.lstrip('#')
@@ -758,210 +980,67 @@ class DevicePage(QWidget):
             self.run_command(["--address", self.mac_address, "--set-time", time])
     pass
     def set_weather(self):
-        city, ok_pressed = QInputDialog.getText(self, "Set Weather", "Enter the city:")
-
-        if ok_pressed and city:  # Check if there is a city
-            def get_current_data(city):
-                url = f"https://api.weatherapi.com/v1/current.json?q={city}&key={api_key}"
-                response = requests.get(url)
-                data = response.json()
-                if response.status_code == 200:
-                    return data
-                else:
-                    raise ValueError("It could not get the info")
-
-            def draw_digit(draw, x_offset, y_offset, digit):
-                pattern = digits[digit]
-                for y, row in enumerate(pattern):
-                    for x, pixel in enumerate(row):
-                        if pixel == "1":
-                            draw.point((x + x_offset, y + y_offset), fill="white")
-
-            def draw_colored_pattern(draw, x_offset, y_offset, key):
-                if key not in patterns:
-                    raise ValueError(f"The pattern '{key}' is not defined.")
-                pattern = patterns[key]
-                for y, row in enumerate(pattern):
-                    for x, pixel in enumerate(row):
-                        if pixel in colors:
-                            draw.point((x + x_offset, y + y_offset), fill=colors[pixel])
-
-            def get_weather_category(condition_code,is_day):
-                weather_switch = {
-                    "sun": [1000],
-                    "partly cloudy": [1003],
-                    "cloudy": [1006, 1009],
-                    "fog": [1030, 1135, 1147],
-                    "raining": [
-                    1063, 1150, 1153, 1180, 1183, 1186, 1189, 1192, 1195, 1240,
-                    1243, 1246, 1273, 1276
-                    ],
-                    "snowing": [
-                    1066, 1114, 1117, 1168, 1171, 1204, 1207, 1210, 1213, 1216,
-                    1219, 1222, 1225, 1255, 1258, 1279, 1282
-                    ],
-                    "thundering": [1087, 1273, 1276, 1279, 1282],
-                    "windy": [1114, 1117]
-                }
-                if is_day == 0:
-                # If it is night , we change the category
-                    weather_switch["moon"] = weather_switch.pop("sun", [1000])
-                    weather_switch["partly cloudy night"] = weather_switch.pop("partly cloudy", [1003])
-
-               
-
-                for category, codes in weather_switch.items():
-                    if condition_code in codes:
-                        return category
-                return "unknown"
-
-        # OGet weather data
-            data_api = get_current_data(city)
-
-            current_weather_code = data_api["current"]["condition"]["code"]
-            is_day = data_api["current"]["is_day"]
-            
-            weather_category = get_weather_category(current_weather_code,is_day)
-            
-
-            temperature_celsius = int(round(data_api["current"]["temp_c"])) 
-            
-        # Do pixel img
-            img = Image.new('RGB', (16, 16), color='black')
-            draw = ImageDraw.Draw(img)
+        self.start_weather("current", "Set Weather")
 
-        # Extract the celsius digits
-            first_digit = str(temperature_celsius).zfill(2)[0]
-            second_digit = str(temperature_celsius).zfill(2)[1]
-
-        # Draw temperature and weather
-            draw_digit(draw, 3, 8, first_digit)
-            draw_digit(draw, 9, 8, second_digit)
-            draw_colored_pattern(draw, 4, 0, weather_category)
-
-        # Save the img
-            file_path = "weather.png"
-            img.save(file_path)
-
-        # Run the command with the new img
-            self.run_command([
-            "--address", self.mac_address,
-            "--image", "true",
-            "--set-image", file_path,
-            "--process-image", str(16)
-        ])
-
-    pass
     def set_weather_gif(self):
-        
-        city, ok_pressed = QInputDialog.getText(self, "Set Weather", "Enter the city:")
-
-        if ok_pressed and city:
-            def get_current_data(city):
-                #2 days, just in case the actual hour +6 is the next day
-                url = f"https://api.weatherapi.com/v1/forecast.json?q={city}&days=2&key={api_key}"
-                response = requests.get(url)
-                data = response.json()
-                if response.status_code == 200:
-                    return data
-                else:
-                    raise ValueError("It could not get the info")
-                
-            def draw_digit(draw, x_offset, y_offset, digit):
-                pattern = digits[digit]
-                for y, row in enumerate(pattern):
-                    for x, pixel in enumerate(row):
-                        if pixel == "1":
-                            draw.point((x + x_offset, y + y_offset), fill=(255,255,255))
-            def draw_colored_pattern(draw, x_offset, y_offset, key):
-                if key not in patterns:
-                    raise ValueError(f"The pattern '{key}' is not defined.")
-                pattern = patterns[key]
-                for y, row in enumerate(pattern):
-                    for x, pixel in enumerate(row):
-                        if pixel in colors:
-                            draw.point((x + x_offset, y + y_offset), fill=colors[pixel])
-            
-            def get_weather_category(condition_code,is_day):
-                weather_switch = {
-                    "sun": [1000],
-                    "partly cloudy": [1003],
-                    "cloudy": [1006, 1009],
-                    "fog": [1030, 1135, 1147],
-                    "raining": [
-                    1063, 1150, 1153, 1180, 1183, 1186, 1189, 1192, 1195, 1240,
-                    1243, 1246, 1273, 1276
-                    ],
-                    "snowing": [
-                    1066, 1114, 1117, 1168, 1171, 1204, 1207, 1210, 1213, 1216,
-                    1219, 1222, 1225, 1255, 1258, 1279, 1282
-                    ],
-                    "thundering": [1087, 1273, 1276, 1279, 1282],
-                    "windy": [1114, 1117]
-                }
-                if is_day == 0:
-                # If it is night , we change the category
-                    weather_switch["moon"] = weather_switch.pop("sun", [1000])
-                    weather_switch["partly cloudy night"] = weather_switch.pop("partly cloudy", [1003])
-
-                for category, codes in weather_switch.items():
-                    if condition_code in codes:
-                        return category
-                return "unknown"
-
-            data_api = get_current_data(city)
-            current_hour = int(data_api["location"]["localtime"].split()[1].split(":")[0])
-            
-            hourly_forecast = data_api["forecast"]["forecastday"][0]["hour"]
-            #Array for all the images
-            images=[]
-            #range must be max 6 because specs
-            for i in range(6):
-                #Checking if the next hour is in the same day or next
-                hour_index = (current_hour + i) % 24
-                if current_hour + i < 24:  # Same day
-                    hour_data = data_api["forecast"]["forecastday"][0]["hour"][hour_index]
-                else:  # Next day
-                    hour_data = data_api["forecast"]["forecastday"][1]["hour"][hour_index]
-
-                condition_code = hour_data["condition"]["code"]
-                is_day = hour_data["is_day"]
-                
-                #Celsius temperature
-                temperature_celsius = int(round(hour_data["temp_c"]))
-
-                weather_category = get_weather_category(condition_code, is_day)
-                
-                # Create the pixel image
-                img = Image.new('RGB', (16, 16), color=1)
-                draw = ImageDraw.Draw(img)
-
-                # Extract the Celsius digits
-                first_digit = str(temperature_celsius).zfill(2)[0]
-                second_digit = str(temperature_celsius).zfill(2)[1]
-                # Determine the digit color (red for the first image, white for others)
-                
-                draw.rectangle([0, 15, i, 15], fill=(255, 255, 255))  #horizontal line to draw the hour, each point is the index of the hour
-
-                draw_digit(draw, 3, 8, first_digit)
-                draw_digit(draw, 9, 8, second_digit)
-                draw_colored_pattern(draw, 4, 0, weather_category)
-                
-                # Save the gif with a unique name
-                if img.getbbox():
-                    images.append(img)
-                else:
-                    print(f"IMG {i} is empty, it will not be added")
-
-            # Run the command with the new image
-            
-            images_array = [numpy.array(img) for img in images]
-
+        self.start_weather("forecast", "Set Weather GIF")
+
+    def start_weather(self, kind, title):
+        city, ok_pressed = QInputDialog.getText(self, title, "Enter the city:")
+        if not (ok_pressed and city):  # Check if there is a city
+            return
+        minutes, ok_pressed = QInputDialog.getInt(self, title, "Update every ... minutes (0 = only once):", 0, 0, 1440)
+        if not ok_pressed:
+            return
+        self.stop_weather()
+        self.weather_request = (kind, city)
+        if minutes:
+            weather_service.watch(kind, city)
+            self.weather_timer.start(minutes * 60 * 1000)
+        self.request_weather()
+
+    def stop_weather(self):
+        self.weather_timer.stop()
+        if self.weather_request:
+            weather_service.unwatch(*self.weather_request)
+            self.weather_request = None
+
+    @staticmethod
+    def replaces_screen(command):
+        return any(arg.split("=", 1)[0] in SCREEN_FLAGS for arg in command.split())
+
+    def send_weather(self, args):
+        self.weather_command = " ".join(args)
+        self.run_command(args)
+
+    def request_weather(self):
+        if not self.weather_request:
+            return
+        kind, city = self.weather_request
+        # the answer arrives on a worker thread, the signal hands it to the UI thread
+        weather_service.request(kind, city, lambda data, error: self.weather_received.emit(kind, data, error))
+
+    def handle_weather(self, kind, data, error):
+        if not self.weather_request or self.weather_request[0] != kind:
+            # stopped while the request was running
+            return
+        if error is not None:
+            self.console_output.appendPlainText(f"Weather failed: {error}\n")
+            return
+        if kind == "current":
+            file_path = "weather.png"
+            weather.render_current(data).save(file_path)
+            self.send_weather([
+                "--address", self.mac_address,
+                "--image", "true",
+                "--set-image", file_path,
+                "--process-image", str(16)
+            ])
+        else:
+            images = weather.render_forecast(data)
             gif_path = "weather_forecast.gif"
-
-            images[0].save(gif_path, save_all=True, append_images=images[1:], duration=[1000, 1000, 1000, 1000, 1000, 1000], loop=0)
-            self.run_command(["--address", self.mac_address, "--set-gif", gif_path, "--process-gif", str(16)])
-
+            images[0].save(gif_path, save_all=True, append_images=images[1:], duration=[1000] * len(images), loop=0)
+            self.send_weather(["--address", self.mac_address, "--set-gif", gif_path, "--process-gif", str(16)])
 
     def screen_control(self, state):
         self.run_command(["--address", self.mac_address, "--screen", state])
@@ -1052,7 +1131,7 @@ class DevicePage(QWidget):
                 self.run_command(["--address", self.mac_address, "--image", "true", "--set-image", file_path, "--process-image", image_size])
 
     def set_gif(self):
-        confirmation = QMessageBox.question(self, "GIF Notice", "All GIFs are processed by default to ensure maximum compatibility. \n\nThis doesn't always work for all GIFs. \n\nGIFs closer to 32x32 or 16x16 have better chances of working.",
+        confirmation = QMessageBox.question(self, "GIF Notice", "All GIFs are processed by default to ensure maximum compatibility. \n\nLarge GIFs are resized frame by frame and frames are dropped until the animation fits into the device memory. \n\nGIFs closer to 32x32 or 16x16 keep the most detail.",
                                             QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
 
         if confirmation == QMessageBox.Yes:
@@ -1191,6 +1270,7 @@ class MainWindow(QWidget):
         self.center_window()
 
         self.device_pages = {}
+        self.scan_connected = False
 
         self.device_buttons = {}  
         self.load_device_settings()
@@ -1210,29 +1290,38 @@ class MainWindow(QWidget):
     def scan_for_devices(self):
         self.configuration_page.console_output.clear()
         self.output_str = ""
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.MergedChannels)
-        self.process.readyRead.connect(self.handle_ready_read)
-        self.process.finished.connect(self.process_finished)
-        self.process.start("cmd.exe", ["/c", "python app.py --scan"])
-
-    def handle_ready_read(self):
-        data = self.process.readAll()
-        stdout = bytes(data).decode("utf8")
-        self.output_str += stdout
-        self.configuration_page.console_output.appendPlainText(stdout)
-
-        device_name_pattern = re.compile(r"found device ([\dA-F:]+) with name (\S+)")
-        matches = device_name_pattern.findall(stdout)
-        if matches:
-            self.configuration_page.device_list.clear()
-            for mac_address, device_name in matches:
-                item = QListWidgetItem(device_name)
-                self.configuration_page.device_list.addItem(item)
-                item.setToolTip(mac_address)
-
-    def process_finished(self):
-        pass
+        # show the devices seen before right away, the scan adds the ones in range
+        discovery = DeviceDiscovery()
+        discovery.load()
+        self.configuration_page.device_list.clear()
+        for device in discovery.candidates():
+            self.add_found_device(device.address, device.name or device.address)
+        bridge = DeviceCommandBridge.shared()
+        if not self.scan_connected:
+            bridge.command_event.connect(self.handle_scan_event)
+            self.scan_connected = True
+        bridge.scan()
+
+    def handle_scan_event(self, mac_address, event, message):
+        if mac_address != DeviceCommandBridge.SCAN:
+            return
+        if event == "log":
+            self.output_str += message + "\n"
+            self.configuration_page.console_output.appendPlainText(message)
+            device_name_pattern = re.compile(r"found device ([\dA-F:]+) with name (\S+)")
+            for mac_address, device_name in device_name_pattern.findall(message):
+                self.add_found_device(mac_address, device_name)
+        elif event in ("finished", "failed"):
+            self.configuration_page.console_output.appendPlainText(f"Scan {event}: {message}")
+
+    def add_found_device(self, mac_address, device_name):
+        device_list = self.configuration_page.device_list
+        for i in range(device_list.count()):
+            if device_list.item(i).toolTip() == mac_address:
+                return
+        item = QListWidgetItem(device_name)
+        device_list.addItem(item)
+        item.setToolTip(mac_address)
 
     def add_device_to_homepage(self, friendly_name, mac_address):
         if mac_address not in self.device_buttons:
@@ -1,8 +1,8 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import json
 import os
-import subprocess
-from threading import Thread
+from jobs import CONTINUE, IGNORE, JobRunner
+from streams import FrameHub, follow_log, read_tail
 
 # Flask app setup
 app = Flask(__name__)
@@ -15,36 +15,49 @@ PARENT_DIR = os.path.join(BASE_DIR, '..')  # Move up one directory
 CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
 LOG_PATH = os.path.join(PARENT_DIR, "app.log")
 SCRIPT_PATH = os.path.join(PARENT_DIR, "GlucoseMatrixDisplay.py")
+# Every step runs like before, stash and stash pop fail whenever there are no local changes
+UPDATE_COMMANDS = [
+    ("sudo git stash", IGNORE),
+    ("sudo git pull", CONTINUE),
+    ("sudo git stash pop", IGNORE),
+    "sudo systemctl restart glucose_matrix.service"
+]
+RESTART_COMMANDS = ["sudo systemctl restart glucose_matrix.service"]
 
-# Function to run the Python script
-def run_script():
-    with open(LOG_PATH, "a") as log_file:
-        process = subprocess.Popen(
-            ["python", SCRIPT_PATH],
-            stdout=log_file,
-            stderr=log_file,
-        )
-        process.wait()
+# Maintenance commands run in the background, the routes only queue them
+jobs = JobRunner(cwd=PARENT_DIR, log_path=LOG_PATH)
+# Newest frame posted by the display, kept in memory only
+frames = FrameHub()
+# Frames are tiny, anything bigger is not from the display
+MAX_FRAME_SIZE = 256 * 1024
+
+def submit_job(name, commands, timeout):
+    job, created = jobs.submit(name, commands, timeout)
+    message = f"{name} started" if created else f"{name} is already {job.status}"
+    return jsonify({"status": "success", "message": message, "job": job.to_dict(with_output=False)}), 202
 
 @app.route("/run", methods=["POST"])
 def run_script():
-    with open(LOG_PATH, "a") as log_file:
-        commands = [
-            "sudo git stash",
-            "sudo git pull",
-            "sudo git stash pop",
-            "sudo systemctl restart glucose_matrix.service"
-        ]
-        for command in commands:
-            process = subprocess.Popen(
-                command,
-                shell=True,
-                stdout=log_file,
-                stderr=log_file,
-            )
-            process.wait()
+    return submit_job("update", UPDATE_COMMANDS, timeout=600)
 
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": jobs.list()})
 
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify({"job": job.to_dict()})
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    if jobs.get(job_id) is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    if not jobs.cancel(job_id):
+        return jsonify({"message": "Job already finished"}), 409
+    return jsonify({"message": "Job cancelled"})
 
 @app.route("/")
 def index():
@@ -66,6 +79,9 @@ def save_config():
         config_data = request.get_json()
         # Convert numeric strings to actual numbers
         for key, value in config_data.items():
+            # The form only has text inputs, anything else is kept as it was sent
+            if not isinstance(value, str):
+                continue
             if value.isdigit():
                 config_data[key] = int(value)
             else:
@@ -73,26 +89,17 @@ def save_config():
                     config_data[key] = float(value)
                 except ValueError:
                     pass
-        with open(CONFIG_PATH, "w") as config_file:
+        # Written to a temporary file first, the display reloads config.json as soon as it changes.
+        with open(CONFIG_PATH + ".tmp", "w") as config_file:
             json.dump(config_data, config_file, indent=4)
+        os.replace(CONFIG_PATH + ".tmp", CONFIG_PATH)
         return jsonify({"message": "Config saved successfully!"})
     except Exception as e:
         return jsonify({"message": str(e)}), 500
     
 @app.route("/restart-service", methods=["POST"])
 def restart_service():
-    try:
-        result = subprocess.run(
-            ["sudo", "systemctl", "restart", "glucose_matrix.service"],
-            capture_output=True,
-            text=True,
-        )
-        if result.returncode == 0:
-            return jsonify({"message": "Service restarted successfully!"})
-        else:
-            return jsonify({"message": result.stderr}), 500
-    except Exception as e:
-        return jsonify({"message": str(e)}), 500
+    return submit_job("restart", RESTART_COMMANDS, timeout=60)
     
 # Get the logs as JSON
 @app.route("/logs", methods=["GET"])
@@ -100,29 +107,45 @@ def get_logs():
     try:
         max_lines = 100  # Define the maximum number of lines to show in the logs
         if os.path.exists(LOG_PATH):
-            with open(LOG_PATH, "r") as file:
-                # Read only the last `max_lines` lines from the file
-                lines = file.readlines()[-max_lines:]
-                logs = "".join(lines)
+            # Read only the end of the file
+            logs, _ = read_tail(LOG_PATH, max_lines)
         else:
             logs = "No logs available yet."
         return jsonify({"logs": logs})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def event_stream(events):
+    return Response(events, mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Follow the logs, a reconnecting browser continues from the offset it got last
+@app.route("/logs/stream", methods=["GET"])
+def stream_logs():
+    offset = request.headers.get("Last-Event-ID", request.args.get("offset"))
+    return event_stream(follow_log(LOG_PATH, int(offset) if offset and offset.isdigit() else None))
+
+# The display posts every frame it shows as a PNG
+@app.route("/frames", methods=["POST"])
+def post_frame():
+    if request.content_length is None or request.content_length > MAX_FRAME_SIZE:
+        return jsonify({"message": "Frame missing or too big"}), 413
+    frames.publish(request.get_data())
+    return "", 204
+
+@app.route("/frames/latest.png", methods=["GET"])
+def latest_frame():
+    if frames.frame is None:
+        return jsonify({"error": "No frame received yet"}), 404
+    return Response(frames.frame, mimetype="image/png", headers={"Cache-Control": "no-cache"})
+
+@app.route("/frames/stream", methods=["GET"])
+def stream_frames():
+    return event_stream(frames.stream())
+
 # Perform a Git pull
 @app.route("/git-pull", methods=["POST"])
 def git_pull():
-    try:
-        result = subprocess.run(
-            ["git", "pull"],
-            cwd=os.path.dirname(SCRIPT_PATH),
-            capture_output=True,
-            text=True,
-        )
-        return jsonify({"status": "success", "output": result.stdout})
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return submit_job("git pull", ["git pull"], timeout=120)
 
 # Handle errors globally
 @app.errorhandler(404)
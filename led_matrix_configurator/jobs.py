@@ -0,0 +1,170 @@
+import collections
+import logging
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed out"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+# What happens when a step of a job fails, a step is a command or a (command, on failure) pair
+STOP = "stop"
+CONTINUE = "continue"  # the remaining steps run, the job ends as failed
+IGNORE = "ignore"  # the exit code does not matter
+
+def stop_process(process, sig):
+    # The shell runs the command as its child, so the whole process group is signalled.
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, sig)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+class Job:
+    def __init__(self, name, commands, timeout):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.commands = commands
+        self.timeout = timeout
+        self.status = QUEUED
+        self.output = []
+        self.returncode = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.process = None
+        self.cancel_requested = False
+
+    def to_dict(self, with_output=True):
+        job = {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "returncode": self.returncode,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if with_output:
+            job["output"] = "".join(self.output)
+        return job
+
+
+class JobRunner:
+    """runs maintenance commands one job at a time on a worker thread, so requests return right away"""
+
+    def __init__(self, cwd=None, log_path=None, keep=50):
+        self.cwd = cwd
+        self.log_path = log_path
+        self.jobs = collections.OrderedDict()
+        self.keep = keep
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = threading.Thread(target=self.work, name="job-runner", daemon=True)
+        self.worker.start()
+
+    def submit(self, name, commands, timeout=300):
+        with self.lock:
+            # Pressing a button twice joins the job which is already waiting or running.
+            for job in self.jobs.values():
+                if job.name == name and job.status in (QUEUED, RUNNING):
+                    return job, False
+            job = Job(name, commands, timeout)
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.keep:
+                oldest = next(iter(self.jobs.values()))
+                if oldest.status not in FINISHED:
+                    break
+                self.jobs.popitem(last=False)
+        self.queue.put(job)
+        return job, True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return [job.to_dict(with_output=False) for job in reversed(self.jobs.values())]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        job.cancel_requested = True
+        if job.status == QUEUED:
+            self.finish(job, CANCELLED)
+        elif job.process is not None:
+            stop_process(job.process, signal.SIGTERM)
+        return True
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job.status == QUEUED:
+                try:
+                    self.run(job)
+                except Exception as e:
+                    job.output.append(f"{e}\n")
+                    self.finish(job, FAILED)
+
+    def run(self, job):
+        job.status = RUNNING
+        job.started = time.time()
+        deadline = job.started + job.timeout
+        failed = False
+        for step in job.commands:
+            command, on_failure = (step, STOP) if isinstance(step, str) else step
+            if job.cancel_requested:
+                return self.finish(job, CANCELLED)
+            self.append(job, f"$ {command}\n")
+            job.process = subprocess.Popen(
+                command,
+                shell=True,
+                cwd=self.cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                start_new_session=True,
+            )
+            # The timeout covers the whole job, a hanging command is killed when it runs out.
+            timer = threading.Timer(max(0, deadline - time.time()), stop_process, (job.process, signal.SIGKILL))
+            timer.start()
+            try:
+                for line in job.process.stdout:
+                    self.append(job, line)
+                job.returncode = job.process.wait()
+            finally:
+                timer.cancel()
+            if job.cancel_requested:
+                return self.finish(job, CANCELLED)
+            if time.time() >= deadline:
+                self.append(job, f"Timed out after {job.timeout} seconds.\n")
+                return self.finish(job, TIMED_OUT)
+            if job.returncode != 0 and on_failure != IGNORE:
+                if on_failure == STOP:
+                    return self.finish(job, FAILED)
+                self.append(job, f"Exit code {job.returncode}, continuing.\n")
+                failed = True
+        self.finish(job, FAILED if failed else SUCCEEDED)
+
+    def append(self, job, line):
+        job.output.append(line)
+        if self.log_path:
+            with open(self.log_path, "a") as log_file:
+                log_file.write(line)
+
+    def finish(self, job, status):
+        job.status = status
+        job.finished = time.time()
+        job.process = None
+        logging.info(f"Job {job.name} ({job.id}) {status}.")
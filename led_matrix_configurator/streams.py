@@ -0,0 +1,82 @@
+import base64
+import json
+import os
+import threading
+import time
+
+# Comment lines keep idle connections from being closed by browsers and proxies
+KEEP_ALIVE = 15
+
+def sse(data, event=None, event_id=None):
+    message = ""
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    if event:
+        message += f"event: {event}\n"
+    return message + f"data: {data}\n\n"
+
+def read_tail(path, max_lines=100, block_size=4096):
+    """returns the last lines of a file and the offset to follow it from, without reading all of it"""
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        end = file.tell()
+        position = end
+        data = b""
+        while position > 0 and data.count(b"\n") <= max_lines:
+            position = max(0, position - block_size)
+            file.seek(position)
+            data = file.read(end - position)
+    lines = data.splitlines(keepends=True)[-max_lines:]
+    return b"".join(lines).decode("utf-8", errors="replace"), end
+
+def follow_log(path, offset=None, max_lines=100, interval=0.5):
+    """yields SSE events with the text appended to the log since the last one"""
+    if offset is None:
+        text, offset = read_tail(path, max_lines) if os.path.exists(path) else ("", 0)
+        yield sse(json.dumps({"text": text, "reset": True}), event_id=offset)
+    last_event = time.time()
+    while True:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < offset:
+            # The log was truncated or rotated, start over from its beginning
+            offset = 0
+        if size > offset:
+            with open(path, "rb") as file:
+                file.seek(offset)
+                chunk = file.read(size - offset)
+            # Only whole lines are sent, a line still being written follows with the next event
+            end = chunk.rfind(b"\n") + 1
+            if end:
+                offset += end
+                yield sse(json.dumps({"text": chunk[:end].decode("utf-8", errors="replace")}), event_id=offset)
+                last_event = time.time()
+        if time.time() - last_event > KEEP_ALIVE:
+            yield ": keep-alive\n\n"
+            last_event = time.time()
+        time.sleep(interval)
+
+
+class FrameHub:
+    """keeps the newest frame posted by the display and wakes up every stream waiting for it"""
+
+    def __init__(self):
+        self.frame = None
+        self.sequence = 0
+        self.condition = threading.Condition()
+
+    def publish(self, png):
+        with self.condition:
+            self.frame = png
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def stream(self, sequence=0):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.sequence != sequence, timeout=KEEP_ALIVE)
+                frame, new_sequence = self.frame, self.sequence
+            if new_sequence == sequence or frame is None:
+                yield ": keep-alive\n\n"
+                continue
+            sequence = new_sequence
+            yield sse(base64.b64encode(frame).decode("ascii"), event="frame", event_id=sequence)
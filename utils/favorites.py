@@ -0,0 +1,138 @@
+# python imports
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+# third party imports
+import numpy as np
+from PIL import Image
+
+FAVORITES_DIR = os.environ.get("IDOTMATRIX_FAVORITES", "favorites")
+INDEX_FILE = "index.json"
+THUMBNAIL_SIZE = 16
+# the pixel editor shows unpainted cells as white, on the device they stay dark
+EMPTY_COLOR = (255, 255, 255)
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """stores the drawing as indexed png when it has up to 256 colors, which pixel art nearly always has"""
+    colors, indexes = np.unique(pixels.reshape(-1, 3), axis=0, return_inverse=True)
+    if len(colors) <= 256:
+        image = Image.fromarray(indexes.reshape(pixels.shape[:2]).astype(np.uint8), mode="P")
+        image.putpalette(colors.astype(np.uint8).flatten().tolist())
+    else:
+        image = Image.fromarray(pixels, mode="RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class FavoritesLibrary:
+    """pixel editor drawings as png files in one folder.
+    The index keeps name, size, hash and a thumbnail of every drawing, so listing the
+    library never opens the drawings themselves; they are read when one is selected.
+    """
+
+    def __init__(self, path: str = FAVORITES_DIR) -> None:
+        self.path = path
+        self.index_path = os.path.join(path, INDEX_FILE)
+        self.entries: Dict[str, dict] = {}
+        self.load_index()
+
+    def load_index(self) -> None:
+        try:
+            with open(self.index_path, "r") as file:
+                self.entries = {entry["name"]: entry for entry in json.load(file)["favorites"]}
+        except FileNotFoundError:
+            self.entries = {}
+        except (OSError, ValueError, KeyError) as error:
+            logger.error(f"could not read the favorites index: {error}")
+            self.entries = {}
+
+    def save_index(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.index_path + ".tmp", "w") as file:
+            json.dump({"favorites": list(self.entries.values())}, file, indent=1)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def names(self) -> List[str]:
+        return list(self.entries)
+
+    def thumbnail(self, name: str) -> bytes:
+        return base64.b64decode(self.entries[name]["thumbnail"])
+
+    def file_path(self, name: str) -> str:
+        return os.path.join(self.path, self.entries[name]["file"])
+
+    def save(self, name: str, pixels: np.ndarray) -> dict:
+        png = encode_png(pixels)
+        digest = hashlib.sha1(png).hexdigest()
+        file_name = f"{digest[:16]}.png"
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, file_name), "wb") as file:
+            file.write(png)
+        thumbnail = Image.fromarray(pixels, mode="RGB").resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.NEAREST)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format="PNG")
+        previous = self.entries.get(name)
+        self.entries[name] = {
+            "name": name,
+            "size": pixels.shape[0],
+            "hash": digest,
+            "file": file_name,
+            "thumbnail": base64.b64encode(buffer.getvalue()).decode("ascii"),
+            "saved": time.time(),
+        }
+        self.save_index()
+        if previous and previous["file"] != file_name:
+            self.remove_files(previous)
+        return self.entries[name]
+
+    def load(self, name: str) -> Optional[np.ndarray]:
+        if name not in self.entries:
+            return None
+        try:
+            with Image.open(self.file_path(name)) as image:
+                return np.array(image.convert("RGB"))
+        except OSError as error:
+            logger.error(f"could not read favorite {name}: {error}")
+            return None
+
+    def delete(self, name: str) -> None:
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self.save_index()
+            self.remove_files(entry)
+
+    def remove_files(self, entry: dict) -> None:
+        # drawings saved twice under different names share one file
+        if any(other["file"] == entry["file"] for other in self.entries.values()):
+            return
+        for file_name in (entry["file"], self.device_file(entry)):
+            try:
+                os.remove(os.path.join(self.path, file_name))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def device_file(entry: dict) -> str:
+        return entry["file"].replace(".png", "-device.png")
+
+    def device_path(self, name: str) -> Optional[str]:
+        """png for the image upload with unpainted cells turned off, written once per drawing"""
+        path = os.path.join(self.path, self.device_file(self.entries[name]))
+        if not os.path.exists(path):
+            pixels = self.load(name)
+            if pixels is None:
+                return None
+            pixels[np.all(pixels == EMPTY_COLOR, axis=2)] = 0
+            with open(path, "wb") as file:
+                file.write(encode_png(pixels))
+        return path
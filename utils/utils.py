@@ -1,3 +1,5 @@
+from PIL import Image, ImageColor
+
 digits = {
     "-": [
         "    ",
@@ -215,6 +217,25 @@ patterns = {
     ],
 }
 
+# the patterns and digits compiled once into images, so a frame is drawn with one paste per tile
+def _compile_pattern(pattern):
+    tile = Image.new("RGBA", (len(pattern[0]), len(pattern)), (0, 0, 0, 0))
+    tile.putdata([
+        ImageColor.getrgb(colors[pixel]) + (255,) if pixel in colors else (0, 0, 0, 0)
+        for row in pattern for pixel in row
+    ])
+    return tile
+
+
+def _compile_digit(rows):
+    mask = Image.new("L", (len(rows[0]), len(rows)), 0)
+    mask.putdata([255 if pixel == "1" else 0 for row in rows for pixel in row])
+    return mask
+
+
+pattern_tiles = {key: _compile_pattern(pattern) for key, pattern in patterns.items()}
+digit_masks = {key: _compile_digit(rows) for key, rows in digits.items()}
+
 #You need to create a free account in www.weatherapi.com , completely free , no credit card needed
 #Copy and paste your api key betweent the ""
 #example : "4bda1f92e2d64d3b9352567947a8900"
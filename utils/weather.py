@@ -0,0 +1,208 @@
+# python imports
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# third party imports
+from PIL import Image, ImageColor
+import requests
+
+# client imports
+from utils.utils import api_key, digit_masks, pattern_tiles
+
+# point this to a local stub server (e.g. http://localhost:8000/v1) to test without the real api
+BASE_URL = os.environ.get("WEATHER_API_URL", "https://api.weatherapi.com/v1")
+# seconds a weather response is reused before it is fetched again
+CACHE_TTL = 10 * 60
+REQUEST_TIMEOUT = 10
+
+# weatherapi.com condition codes per pattern, the first matching category wins
+WEATHER_CODES = {
+    "sun": [1000],
+    "partly cloudy": [1003],
+    "cloudy": [1006, 1009],
+    "fog": [1030, 1135, 1147],
+    "raining": [
+        1063, 1150, 1153, 1180, 1183, 1186, 1189, 1192, 1195, 1240,
+        1243, 1246, 1273, 1276
+    ],
+    "snowing": [
+        1066, 1114, 1117, 1168, 1171, 1204, 1207, 1210, 1213, 1216,
+        1219, 1222, 1225, 1255, 1258, 1279, 1282
+    ],
+    "thundering": [1087, 1273, 1276, 1279, 1282],
+    "windy": [1114, 1117],
+}
+
+
+def _category_table(is_day: bool) -> Dict[int, str]:
+    categories = dict(WEATHER_CODES)
+    if not is_day:
+        # at night sun and partly cloudy are shown with the night patterns
+        categories["moon"] = categories.pop("sun")
+        categories["partly cloudy night"] = categories.pop("partly cloudy")
+    table = {}
+    for category, codes in categories.items():
+        for code in codes:
+            table.setdefault(code, category)
+    return table
+
+
+CATEGORY_TABLES = {True: _category_table(True), False: _category_table(False)}
+
+logger = logging.getLogger("idotmatrix." + __name__)
+
+
+def weather_category(condition_code: int, is_day) -> str:
+    return CATEGORY_TABLES[bool(is_day)].get(condition_code, "unknown")
+
+
+def draw_digit(img, x_offset, y_offset, digit, fill="white"):
+    if isinstance(fill, str):
+        fill = ImageColor.getrgb(fill)
+    img.paste(fill, (x_offset, y_offset), digit_masks[digit])
+
+
+def draw_colored_pattern(img, x_offset, y_offset, key):
+    if key not in pattern_tiles:
+        raise ValueError(f"The pattern '{key}' is not defined.")
+    tile = pattern_tiles[key]
+    img.paste(tile, (x_offset, y_offset), tile)
+
+
+def draw_weather(img, temperature_celsius, category, fill="white"):
+    temperature = str(temperature_celsius).zfill(2)
+    draw_digit(img, 3, 8, temperature[0], fill)
+    draw_digit(img, 9, 8, temperature[1], fill)
+    draw_colored_pattern(img, 4, 0, category)
+
+
+def render_current(data: dict) -> Image.Image:
+    """draws the current temperature and weather pattern of a current.json response"""
+    current = data["current"]
+    img = Image.new('RGB', (16, 16), color='black')
+    draw_weather(
+        img,
+        int(round(current["temp_c"])),
+        weather_category(current["condition"]["code"], current["is_day"]),
+    )
+    return img
+
+
+def render_forecast(data: dict, hours: int = 6) -> List[Image.Image]:
+    """draws one frame per upcoming hour of a forecast.json response with two days"""
+    current_hour = int(data["location"]["localtime"].split()[1].split(":")[0])
+    forecast_days = data["forecast"]["forecastday"]
+    images = []
+    for i in range(hours):
+        # the upcoming hours may already belong to the next day
+        day = 0 if current_hour + i < 24 else 1
+        hour_data = forecast_days[day]["hour"][(current_hour + i) % 24]
+        img = Image.new('RGB', (16, 16), color=1)
+        draw_weather(
+            img,
+            int(round(hour_data["temp_c"])),
+            weather_category(hour_data["condition"]["code"], hour_data["is_day"]),
+            fill=(255, 255, 255),
+        )
+        # horizontal line to draw the hour, each point is the index of the hour
+        img.paste((255, 255, 255), (0, 15, i + 1, 16))
+        if img.getbbox():
+            images.append(img)
+        else:
+            logger.warning(f"forecast frame {i} is empty, it will not be added")
+    return images
+
+
+class WeatherService:
+    """fetches weatherapi.com data with a per city cache.
+    Requests run on worker threads, so callers never block on the network, and watched
+    cities are refreshed in the background before their cache entry expires.
+    """
+
+    def __init__(self, key: str = api_key, base_url: str = BASE_URL, ttl: float = CACHE_TTL, timeout: float = REQUEST_TIMEOUT) -> None:
+        self.key = key
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.timeout = timeout
+        self.cache: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+        self.watched: Dict[Tuple[str, str], str] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather")
+        self.refresher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def cache_key(kind: str, city: str) -> Tuple[str, str]:
+        return kind, city.strip().lower()
+
+    def fetch(self, kind: str, city: str) -> dict:
+        """requests current or forecast data and stores it in the cache"""
+        params = {"q": city, "key": self.key}
+        if kind == "forecast":
+            # 2 days, just in case the actual hour +6 is the next day
+            params["days"] = 2
+        response = requests.get(f"{self.base_url}/{kind}.json", params=params, timeout=self.timeout)
+        if response.status_code != 200:
+            raise ValueError(f"could not get the weather for {city}: {response.status_code}")
+        data = response.json()
+        with self.lock:
+            self.cache[self.cache_key(kind, city)] = (time.time(), data)
+        return data
+
+    def cached(self, kind: str, city: str) -> Optional[dict]:
+        """returns the cached data if it is still fresh"""
+        with self.lock:
+            entry = self.cache.get(self.cache_key(kind, city))
+        if entry is not None and time.time() - entry[0] <= self.ttl:
+            return entry[1]
+        return None
+
+    def get(self, kind: str, city: str) -> dict:
+        """returns fresh data, fetching it if needed. Blocks, so only call it off the UI thread"""
+        data = self.cached(kind, city)
+        if data is None:
+            data = self.fetch(kind, city)
+        return data
+
+    def request(self, kind: str, city: str, callback: Callable[[Optional[dict], Optional[Exception]], None]) -> Future:
+        """fetches data on a worker thread and calls callback(data, error) from that thread"""
+
+        def run():
+            try:
+                data = self.get(kind, city)
+            except Exception as error:
+                logger.error(f"weather request failed: {error}")
+                callback(None, error)
+                return
+            callback(data, None)
+
+        return self.executor.submit(run)
+
+    def watch(self, kind: str, city: str) -> None:
+        """keeps the data of a city fresh in the background"""
+        with self.lock:
+            self.watched[self.cache_key(kind, city)] = city
+        if self.refresher is None:
+            self.refresher = threading.Thread(target=self._refresh, name="weather-refresh", daemon=True)
+            self.refresher.start()
+
+    def unwatch(self, kind: str, city: str) -> None:
+        with self.lock:
+            self.watched.pop(self.cache_key(kind, city), None)
+
+    def _refresh(self) -> None:
+        while True:
+            with self.lock:
+                watched = list(self.watched.items())
+                fetched = {key: entry[0] for key, entry in self.cache.items()}
+            for (kind, _), city in watched:
+                # refresh shortly before the entry expires so readers always find fresh data
+                if time.time() - fetched.get((kind, city.strip().lower()), 0) > self.ttl * 0.8:
+                    try:
+                        self.fetch(kind, city)
+                    except Exception as error:
+                        logger.warning(f"background weather refresh failed: {error}")
+            time.sleep(min(60, self.ttl / 5))